@@ -0,0 +1,47 @@
+"""add sale daily rollup
+
+Revision ID: 3f1c7a9d2b64
+Revises: 598b9cd01333
+Create Date: 2025-06-02 10:14:52.418730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c7a9d2b64'
+down_revision: Union[str, None] = '598b9cd01333'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sale_daily_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('total_revenue', sa.Float(), nullable=False),
+    sa.Column('total_sales', sa.Integer(), nullable=False),
+    sa.Column('total_quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('day', 'product_id', 'category_id')
+    )
+    op.create_index('idx_sale_daily_rollup_category', 'sale_daily_rollup', ['category_id', 'day'], unique=False)
+    # Backfill from the existing sales so the rollup is usable right after upgrade
+    op.execute(
+        "INSERT INTO sale_daily_rollup "
+        "(day, product_id, category_id, total_revenue, total_sales, total_quantity) "
+        "SELECT DATE(sale.sale_date), sale.product_id, product.category_id, "
+        "SUM(sale.total_amount), COUNT(sale.id), SUM(sale.quantity) "
+        "FROM sale JOIN product ON product.id = sale.product_id "
+        "GROUP BY DATE(sale.sale_date), sale.product_id, product.category_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sale_daily_rollup_category', table_name='sale_daily_rollup')
+    op.drop_table('sale_daily_rollup')
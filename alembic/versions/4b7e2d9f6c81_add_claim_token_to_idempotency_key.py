@@ -0,0 +1,26 @@
+"""add claim token to idempotency key
+
+Revision ID: 4b7e2d9f6c81
+Revises: 9e5c3b8a1d74
+Create Date: 2025-07-02 11:18:43.905216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2d9f6c81'
+down_revision: Union[str, None] = '9e5c3b8a1d74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_key', sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_key', 'claim_token')
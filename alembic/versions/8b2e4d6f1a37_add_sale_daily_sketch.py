@@ -0,0 +1,32 @@
+"""add sale daily sketch
+
+Revision ID: 8b2e4d6f1a37
+Revises: 3f1c7a9d2b64
+Create Date: 2025-06-09 16:41:07.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d6f1a37'
+down_revision: Union[str, None] = '3f1c7a9d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sale_daily_sketch',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('day', 'kind')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sale_daily_sketch')
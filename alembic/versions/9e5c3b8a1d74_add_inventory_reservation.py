@@ -0,0 +1,45 @@
+"""add inventory reservation
+
+Revision ID: 9e5c3b8a1d74
+Revises: d2f7a4c9e613
+Create Date: 2025-06-30 09:41:17.562904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5c3b8a1d74'
+down_revision: Union[str, None] = 'd2f7a4c9e613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('inventory', sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('inventory_reservation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_reservation_id'), 'inventory_reservation', ['id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservation_expires_at'), 'inventory_reservation', ['expires_at'], unique=False)
+    op.create_index('idx_inventory_reservation_order_product', 'inventory_reservation', ['order_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_inventory_reservation_order_product', table_name='inventory_reservation')
+    op.drop_index(op.f('ix_inventory_reservation_expires_at'), table_name='inventory_reservation')
+    op.drop_index(op.f('ix_inventory_reservation_id'), table_name='inventory_reservation')
+    op.drop_table('inventory_reservation')
+    op.drop_column('inventory', 'reserved')
@@ -0,0 +1,98 @@
+"""partition sale and inventory_history by month
+
+Revision ID: a7d3e9c2f158
+Revises: f1b6d9a3c827
+Create Date: 2025-06-23 08:41:19.204733
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9c2f158'
+down_revision: Union[str, None] = 'f1b6d9a3c827'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Empty monthly partitions created past the current month; scripts/manage_partitions.py
+# and the scheduler keep adding them afterwards
+MONTHS_AHEAD = 3
+
+# Table -> partitioning column
+PARTITIONED = (
+    ('sale', 'sale_date'),
+    ('inventory_history', 'timestamp'),
+)
+
+# Foreign keys restored on downgrade: table, name, local column, referred table
+FOREIGN_KEYS = (
+    ('sale', None, 'product_id', 'product'),
+    ('sale', None, 'order_id', 'order'),
+    ('sale', None, 'customer_id', 'customer'),
+    ('sale', 'fk_sale_category', 'category_id', 'category'),
+    ('inventory_history', None, 'inventory_id', 'inventory'),
+)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _partitions(bind, table: str, column: str) -> str:
+    # One partition per month from the oldest row to MONTHS_AHEAD past today, plus a
+    # catch-all so inserts never fail if maintenance falls behind
+    oldest = bind.execute(sa.text(f"SELECT MIN(`{column}`) FROM `{table}`")).scalar()
+    month = (oldest.date() if oldest else date.today()).replace(day=1)
+    last = date.today().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+
+    partitions = []
+    while month <= last:
+        upper = _next_month(month)
+        partitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper.isoformat()}')")
+        month = upper
+    partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(partitions)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table, column in PARTITIONED:
+        # MySQL does not support foreign keys on partitioned tables
+        for foreign_key in sa.inspect(bind).get_foreign_keys(table):
+            op.drop_constraint(foreign_key['name'], table, type_='foreignkey')
+
+        # Every unique key has to include the partitioning column
+        op.execute(f"UPDATE `{table}` SET `{column}` = NOW() WHERE `{column}` IS NULL")
+        op.alter_column(
+            table, column,
+            existing_type=sa.DateTime(timezone=True),
+            existing_server_default=sa.text('now()'),
+            nullable=False
+        )
+        op.execute(f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `{column}`)")
+
+        op.execute(
+            f"ALTER TABLE `{table}` PARTITION BY RANGE COLUMNS(`{column}`) ({_partitions(bind, table, column)})"
+        )
+
+
+def downgrade() -> None:
+    for table, column in reversed(PARTITIONED):
+        op.execute(f"ALTER TABLE `{table}` REMOVE PARTITIONING")
+        op.execute(f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`)")
+        op.alter_column(
+            table, column,
+            existing_type=sa.DateTime(timezone=True),
+            existing_server_default=sa.text('now()'),
+            nullable=True
+        )
+
+    # Archived partitions stay in their archive tables
+    for table, name, column, referred in FOREIGN_KEYS:
+        op.create_foreign_key(name, table, referred, [column], ['id'])
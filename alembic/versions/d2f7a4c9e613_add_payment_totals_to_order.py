@@ -0,0 +1,59 @@
+"""add payment totals to order
+
+Revision ID: d2f7a4c9e613
+Revises: b3e8f2a6d419
+Create Date: 2025-06-27 10:52:31.847219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7a4c9e613'
+down_revision: Union[str, None] = 'b3e8f2a6d419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Orders backfilled per UPDATE
+BATCH_SIZE = 10000
+
+OLD_PAYMENT_STATUS = sa.Enum('PENDING', 'COMPLETED', 'FAILED', 'REFUNDED', name='paymentstatus')
+NEW_PAYMENT_STATUS = sa.Enum('PENDING', 'COMPLETED', 'FAILED', 'REFUNDED', 'PARTIAL', name='paymentstatus')
+
+
+def upgrade() -> None:
+    # Appending a value is an in-place change for MySQL
+    op.alter_column('payment', 'status', existing_type=OLD_PAYMENT_STATUS, type_=NEW_PAYMENT_STATUS, existing_nullable=True)
+
+    op.add_column('order', sa.Column('amount_paid', sa.Float(), server_default='0', nullable=False))
+    op.add_column('order', sa.Column('payment_status', NEW_PAYMENT_STATUS, server_default='PENDING', nullable=False))
+
+    # Backfill in id ranges; MySQL assigns left to right, so the status sees the new amount
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT MAX(id) FROM `order`")).scalar() or 0
+    for start in range(0, max_id, BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                "UPDATE `order` SET "
+                "amount_paid = (SELECT COALESCE(SUM(payment.amount), 0) FROM payment "
+                "WHERE payment.order_id = `order`.id AND payment.status = 'COMPLETED'), "
+                "payment_status = CASE "
+                "WHEN amount_paid > 0 AND amount_paid >= total THEN 'COMPLETED' "
+                "WHEN amount_paid > 0 THEN 'PARTIAL' "
+                "ELSE 'PENDING' END "
+                "WHERE id > :start AND id <= :end"
+            ),
+            {"start": start, "end": start + BATCH_SIZE}
+        )
+
+    op.create_index('idx_order_payment_status', 'order', ['payment_status', 'order_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_order_payment_status', table_name='order')
+    op.drop_column('order', 'payment_status')
+    op.drop_column('order', 'amount_paid')
+    op.alter_column('payment', 'status', existing_type=NEW_PAYMENT_STATUS, type_=OLD_PAYMENT_STATUS, existing_nullable=True)
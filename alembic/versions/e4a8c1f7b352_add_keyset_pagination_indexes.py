@@ -0,0 +1,29 @@
+"""add keyset pagination indexes
+
+Revision ID: e4a8c1f7b352
+Revises: c5d9e2a7f4b1
+Create Date: 2025-06-18 10:27:44.519306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a8c1f7b352'
+down_revision: Union[str, None] = 'c5d9e2a7f4b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Unfiltered sale and order lists page by (date, id); InnoDB appends the id
+    op.create_index('idx_sale_date', 'sale', ['sale_date'], unique=False)
+    op.create_index('idx_order_date', 'order', ['order_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_order_date', table_name='order')
+    op.drop_index('idx_sale_date', table_name='sale')
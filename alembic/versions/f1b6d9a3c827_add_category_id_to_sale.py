@@ -0,0 +1,48 @@
+"""add category_id to sale
+
+Revision ID: f1b6d9a3c827
+Revises: e4a8c1f7b352
+Create Date: 2025-06-20 09:13:05.662817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d9a3c827'
+down_revision: Union[str, None] = 'e4a8c1f7b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Sales backfilled per UPDATE
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    op.add_column('sale', sa.Column('category_id', sa.Integer(), nullable=True))
+
+    # Backfill in id ranges so each UPDATE only locks a bounded slice of the table
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT MAX(id) FROM sale")).scalar() or 0
+    for start in range(0, max_id, BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                "UPDATE sale JOIN product ON product.id = sale.product_id "
+                "SET sale.category_id = product.category_id "
+                "WHERE sale.id > :start AND sale.id <= :end"
+            ),
+            {"start": start, "end": start + BATCH_SIZE}
+        )
+
+    op.alter_column('sale', 'category_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key('fk_sale_category', 'sale', 'category', ['category_id'], ['id'])
+    op.create_index('idx_sale_category', 'sale', ['category_id', 'sale_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sale_category', table_name='sale')
+    op.drop_constraint('fk_sale_category', 'sale', type_='foreignkey')
+    op.drop_column('sale', 'category_id')
@@ -5,7 +5,7 @@ from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.security import ALGORITHM
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, get_read_session, set_query_budget
 from app.models import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
@@ -14,11 +14,34 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login
 def get_db() -> Generator:
     try:
         db = SessionLocal()
+        set_query_budget(db, settings.QUERY_BUDGET_CRUD_MS)
         yield db
     finally:
         db.close()
 
 
+def get_read_db() -> Generator:
+    """Session for read-only endpoints: a healthy replica, or the primary as fallback."""
+    try:
+        db = get_read_session()
+        set_query_budget(db, settings.QUERY_BUDGET_CRUD_MS)
+        yield db
+    finally:
+        db.close()
+
+
+def get_analytics_db(db: Session = Depends(get_read_db)) -> Session:
+    """Read session with the analytics statement budget."""
+    set_query_budget(db, settings.QUERY_BUDGET_ANALYTICS_MS)
+    return db
+
+
+def get_list_db(db: Session = Depends(get_read_db)) -> Session:
+    """Read session with the list statement budget."""
+    set_query_budget(db, settings.QUERY_BUDGET_LIST_MS)
+    return db
+
+
 async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
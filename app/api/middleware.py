@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services import idempotency
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Set on responses replayed from a previous request with the same key
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Responses here carry credentials (access tokens), which must never be stored;
+# requests to them ignore the header
+EXCLUDED_PATH_PREFIXES = (f"{settings.API_V1_STR}/auth/",)
+MAX_KEY_LENGTH = 255
+# Delay between checks while a duplicate waits on the request holding its key
+POLL_INTERVAL_SECONDS = 0.1
+
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Run a write request carrying an Idempotency-Key at most once.
+
+    The first request claims the key in the idempotency_key table and its
+    successful response is stored; retries with the same key get that response
+    back without reaching the endpoint. A duplicate arriving while the first is
+    still running waits for it (up to IDEMPOTENCY_WAIT_SECONDS). The lease on
+    the key is renewed while the request runs, so a slow request is never
+    taken over by its retry; it only expires if the worker dies. Failed
+    requests release the key so they can be retried. Reusing a key with a
+    different body is rejected with 422. Authentication routes are left
+    out, so tokens are never written to the table.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or scope["method"] not in WRITE_METHODS
+                or scope["path"].startswith(EXCLUDED_PATH_PREFIXES)):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        client_key = headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not client_key:
+            await self.app(scope, receive, send)
+            return
+        if len(client_key) > MAX_KEY_LENGTH:
+            response = JSONResponse(
+                status_code=400,
+                content={"detail": f"{IDEMPOTENCY_KEY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}
+            )
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        key = idempotency.key_hash(scope["method"], scope["path"], headers.get("authorization", ""), client_key)
+        fingerprint = idempotency.request_hash(body)
+        token = idempotency.new_claim_token()
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            existing = await run_in_threadpool(_with_session, idempotency.claim, key, fingerprint, token)
+            if existing is None:
+                break
+            if existing.request_hash != fingerprint:
+                response = JSONResponse(
+                    status_code=422,
+                    content={"detail": f"{IDEMPOTENCY_KEY_HEADER} was already used with a different request"}
+                )
+            elif existing.status_code is not None:
+                response = Response(
+                    content=existing.response_body,
+                    status_code=existing.status_code,
+                    media_type=existing.content_type,
+                    headers={IDEMPOTENT_REPLAYED_HEADER: "true"}
+                )
+            elif time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            else:
+                response = JSONResponse(
+                    status_code=409,
+                    content={"detail": f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress"},
+                    headers={"Retry-After": "1"}
+                )
+            await response(scope, receive, send)
+            return
+
+        await self._run(scope, receive, send, key, token, body)
+
+    async def _renew(self, key: str, token: str) -> None:
+        """Keep the lease on the key alive until cancelled."""
+        while True:
+            await asyncio.sleep(settings.IDEMPOTENCY_LOCK_SECONDS / 3)
+            try:
+                if not await run_in_threadpool(_with_session, idempotency.renew, key, token):
+                    logger.warning("Lost the idempotency key of a running request")
+                    return
+            except Exception:
+                # Try again on the next round; the lease still has time left
+                logger.exception("Could not renew an idempotency key")
+
+    async def _run(self, scope: Scope, receive: Receive, send: Send, key: str, token: str, body: bytes) -> None:
+        # The body was consumed above, so hand it to the endpoint again
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code = 500
+        content_type = None
+        chunks = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = Headers(raw=message["headers"]).get("content-type")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        renewal = asyncio.create_task(self._renew(key, token))
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(_with_session, idempotency.release, key, token)
+            raise
+        finally:
+            renewal.cancel()
+
+        try:
+            if 200 <= status_code < 300:
+                await run_in_threadpool(_with_session, idempotency.complete, key, token, status_code, content_type, b"".join(chunks))
+            else:
+                await run_in_threadpool(_with_session, idempotency.release, key, token)
+        except Exception:
+            # The response already went out; a retry will wait out the lease and run again
+            logger.exception("Could not store the response for an idempotency key")
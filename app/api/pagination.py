@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, and_, or_, text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services.analytics_cache import ResultCache
+
+# Response header carrying the cursor of the next page on list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# List totals keyed by endpoint, filters and user
+count_cache = ResultCache(
+    max_entries=settings.LIST_COUNT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LIST_COUNT_CACHE_SECONDS
+)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque token."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Decode a token produced by encode_cursor for the given sort columns."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(columns: Sequence, values: Sequence[Any], descending: bool):
+    # Rows strictly after the cursor in (columns...) order, spelled out as
+    # c1 < v1 OR (c1 = v1 AND c2 < v2) ... plus a bound on c1 alone so MySQL
+    # can use it as an index range
+    conditions = []
+    for index, (column, value) in enumerate(zip(columns, values)):
+        prefix = [columns[i] == values[i] for i in range(index)]
+        step = column < value if descending else column > value
+        conditions.append(and_(*prefix, step))
+    bound = columns[0] <= values[0] if descending else columns[0] >= values[0]
+    return and_(bound, or_(*conditions))
+
+
+def paginate(
+    query,
+    columns: Sequence,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False
+) -> Tuple[list, Optional[str]]:
+    """Fetch one page of query ordered by columns (the last one must be unique, e.g. id).
+
+    With a cursor the page starts right after the row the cursor was taken
+    from, which costs the same on every page; otherwise skip is used as an
+    offset for backward compatibility. Returns the rows and the cursor of the
+    next page, or None on the last page.
+    """
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+
+def cached_count(key: Hashable, compute: Callable[[], int]) -> int:
+    """Return compute() for key, reusing a result for LIST_COUNT_CACHE_SECONDS."""
+    # An open-ended window, so entries only ever expire by TTL
+    return count_cache.get_or_compute(key, datetime.min, datetime.max, compute)
+
+
+def estimate_table_rows(db: Session, table: str) -> int:
+    """Row count of a whole table from InnoDB statistics, without scanning it."""
+    rows = db.execute(
+        text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ),
+        {"table": table}
+    ).scalar()
+    return int(rows or 0)
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -1,10 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from typing import List
-from datetime import datetime, timedelta
+from sqlalchemy import func, extract, case, and_, or_
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 from app.api import deps
-from app.schemas.sale import RevenueAnalytics, CategoryRevenue, RevenuePeriodComparison
+from app.core.config import settings
+from app.db.session import query_timeouts
+from app.services import analytics_cache, rollup, sales_cube, sketch_store
+from app.services.scheduler import scheduler
+from app.schemas.sale import (
+    RevenueAnalytics, CategoryRevenue, RevenuePeriodComparison,
+    RevenueSeries, RevenueSeriesPoint, AnalyticsCacheStats,
+    TopItem, TopItemsResponse,
+    PercentileValue, OrderValuePercentiles,
+    RollupStatus, QueryBudgetStats
+)
 from app.models import (
     User, Sale as SaleModel,
     Category as CategoryModel,
@@ -13,66 +23,281 @@ from app.models import (
 
 router = APIRouter()
 
+# Upper bound on the number of points a single series request may return
+MAX_SERIES_BUCKETS = 1000
+
+
+def count_unique_customers(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    exact: bool = False
+) -> int:
+    """Helper function to count distinct buying customers in [start_date, end_date).
+
+    By default the per-day HyperLogLog sketches are merged, giving a relative
+    standard error of about 1.04 / sqrt(2 ** HLL_PRECISION) (~1.6% at the default
+    precision) for any range. exact=True runs COUNT(DISTINCT) instead and is only
+    allowed for windows of up to UNIQUE_CUSTOMERS_EXACT_MAX_DAYS days.
+    """
+    if exact:
+        if end_date - start_date > timedelta(days=settings.UNIQUE_CUSTOMERS_EXACT_MAX_DAYS):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Exact unique customer counts are limited to {settings.UNIQUE_CUSTOMERS_EXACT_MAX_DAYS} days"
+            )
+        return db.query(
+            func.count(func.distinct(SaleModel.customer_id))
+        ).filter(
+            SaleModel.sale_date >= start_date,
+            SaleModel.sale_date < end_date
+        ).scalar() or 0
+    
+    last_day = (end_date - timedelta(microseconds=1)).date()
+    return sketch_store.store.merged(db, "unique_customers", start_date.date(), last_day).count()
+
 
 def get_revenue_data(
     db: Session,
     start_date: datetime,
     end_date: datetime,
-    period: str
+    period: str,
+    exact_unique: bool = False
 ) -> RevenueAnalytics:
-    """Helper function to calculate revenue analytics for a given period."""
-    query = db.query(
-        func.sum(SaleModel.total_amount).label("total_revenue"),
-        func.count(SaleModel.id).label("total_sales")
-    ).filter(
-        SaleModel.sale_date >= start_date,
-        SaleModel.sale_date <= end_date
-    )
-    
-    result = query.first()
-    total_revenue = float(result.total_revenue or 0)
-    total_sales = int(result.total_sales or 0)
-    avg_order_value = total_revenue / total_sales if total_sales > 0 else 0
+    """Helper function to calculate revenue analytics for the half-open period [start_date, end_date)."""
+    if sales_cube.use_cube("revenue"):
+        total_revenue, total_sales = sales_cube.get_cube(db).revenue(start_date, end_date, include_end=False)
+    elif period in rollup.PERIOD_TYPES:
+        total_revenue, total_sales = rollup.get_period_revenue_totals(
+            db, period, start_date, end_date, include_end=False
+        )
+    else:
+        total_revenue, total_sales = rollup.get_revenue_totals(db, start_date, end_date, include_end=False)
+    avg_order_value = round(total_revenue / total_sales, 2) if total_sales > 0 else 0
     
     return RevenueAnalytics(
         period=period,
         start_date=start_date,
         end_date=end_date,
-        total_revenue=total_revenue,
+        total_revenue=round(total_revenue, 2),
         total_sales=total_sales,
-        average_order_value=avg_order_value
+        average_order_value=avg_order_value,
+        unique_customers=count_unique_customers(db, start_date, end_date, exact_unique)
     )
 
 
+def get_revenue_data_for_periods(
+    db: Session,
+    windows: List[Tuple[datetime, datetime]],
+    period: str
+) -> List[RevenueAnalytics]:
+    """Helper function to calculate revenue analytics for several periods in one query.
+
+    Each window is half-open [start, end). Periods already folded by the rollup
+    scheduler are read from their rollup rows; for the rest only rows inside
+    one of the windows are scanned, each aggregated with its own conditional SUM.
+    """
+    totals = {}
+    if sales_cube.use_cube("comparison"):
+        cube = sales_cube.get_cube(db)
+        for start, end in windows:
+            totals[start] = cube.revenue(start, end, include_end=False)
+    else:
+        if period in rollup.PERIOD_TYPES:
+            watermark = rollup.get_period_watermark(db)
+            folded = [
+                start for start, end in windows
+                if watermark is not None and (end - timedelta(days=1)).date() <= watermark
+            ]
+            totals.update(rollup.get_folded_period_totals(db, period, folded))
+        
+        live = [(start, end) for start, end in windows if start not in totals]
+        if live:
+            conditions = [
+                and_(SaleModel.sale_date >= start, SaleModel.sale_date < end)
+                for start, end in live
+            ]
+            columns = []
+            for condition in conditions:
+                columns.append(func.sum(case((condition, SaleModel.total_amount), else_=0)))
+                columns.append(func.sum(case((condition, 1), else_=0)))
+            
+            result = db.query(*columns).filter(or_(*conditions)).first()
+            for index, (start, end) in enumerate(live):
+                totals[start] = (result[2 * index], result[2 * index + 1])
+    
+    analytics = []
+    for start_date, end_date in windows:
+        total_revenue = float(totals[start_date][0] or 0)
+        total_sales = int(totals[start_date][1] or 0)
+        analytics.append(
+            RevenueAnalytics(
+                period=period,
+                start_date=start_date,
+                end_date=end_date,
+                total_revenue=round(total_revenue, 2),
+                total_sales=total_sales,
+                average_order_value=round(total_revenue / total_sales, 2) if total_sales > 0 else 0
+            )
+        )
+    return analytics
+
+
+def get_period_bounds(period: str, reference_date: datetime):
+    """Return the (start, end) datetimes of the period containing reference_date."""
+    if period == "daily":
+        start_date = reference_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + timedelta(days=1)
+    elif period == "weekly":
+        start_date = reference_date - timedelta(days=reference_date.weekday())
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + timedelta(days=7)
+    elif period == "monthly":
+        start_date = reference_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if start_date.month == 12:
+            end_date = start_date.replace(year=start_date.year + 1, month=1)
+        else:
+            end_date = start_date.replace(month=start_date.month + 1)
+    else:  # annual
+        start_date = reference_date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date.replace(year=start_date.year + 1)
+    return start_date, end_date
+
+
 @router.get("/revenue", response_model=RevenueAnalytics)
 def get_revenue(
     period: str = Query(..., enum=["daily", "weekly", "monthly", "annual"]),
     date: datetime = None,
-    db: Session = Depends(deps.get_db),
+    exact_unique: bool = Query(False, description="Count unique customers exactly instead of from HyperLogLog sketches (short periods only)"),
+    db: Session = Depends(deps.get_analytics_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Get revenue analytics for a specific period (staff only)."""
     if date is None:
         date = datetime.now()
     
-    if period == "daily":
-        start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = start_date + timedelta(days=1)
-    elif period == "weekly":
-        start_date = date - timedelta(days=date.weekday())
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = start_date + timedelta(days=7)
-    elif period == "monthly":
-        start_date = date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if date.month == 12:
-            end_date = date.replace(year=date.year + 1, month=1, day=1)
-        else:
-            end_date = date.replace(month=date.month + 1, day=1)
-    else:  # annual
-        start_date = date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_date = date.replace(year=date.year + 1, month=1, day=1)
+    start_date, end_date = get_period_bounds(period, date)
     
-    return get_revenue_data(db, start_date, end_date, period)
+    return analytics_cache.cache.get_or_compute(
+        ("revenue", period, start_date, end_date, exact_unique),
+        start_date,
+        end_date,
+        lambda: get_revenue_data(db, start_date, end_date, period, exact_unique)
+    )
+
+
+def bucket_start(value: date, granularity: str) -> date:
+    """Align a day to the start of its day/week/month bucket."""
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value: date, granularity: str) -> date:
+    """Return the start of the bucket following the one starting at value."""
+    if granularity == "week":
+        return value + timedelta(days=7)
+    if granularity == "month":
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    return value + timedelta(days=1)
+
+
+def get_raw_series_totals(
+    db: Session,
+    granularity: str,
+    start: datetime,
+    end: datetime
+) -> Dict[date, Tuple[float, int]]:
+    """Helper function to aggregate raw sales into day/week/month buckets."""
+    # Compute the bucket key in the database so every bucket comes back from one GROUP BY
+    sale_day = func.date(SaleModel.sale_date)
+    if granularity == "week":
+        bucket = func.subdate(sale_day, func.weekday(SaleModel.sale_date))
+    elif granularity == "month":
+        bucket = func.subdate(sale_day, func.dayofmonth(SaleModel.sale_date) - 1)
+    else:
+        bucket = sale_day
+    bucket = bucket.label("bucket")
+
+    rows = db.query(
+        bucket,
+        func.sum(SaleModel.total_amount).label("revenue"),
+        func.count(SaleModel.id).label("sales")
+    ).filter(
+        SaleModel.sale_date >= start,
+        SaleModel.sale_date <= end
+    ).group_by(bucket).all()
+
+    totals = {}
+    for row in rows:
+        key = row.bucket
+        if isinstance(key, str):
+            key = date.fromisoformat(key[:10])
+        elif isinstance(key, datetime):
+            key = key.date()
+        totals[key] = (float(row.revenue or 0), int(row.sales or 0))
+    return totals
+
+
+@router.get("/revenue/series", response_model=RevenueSeries)
+def get_revenue_series(
+    granularity: str = Query("day", enum=["day", "week", "month"]),
+    start: datetime = None,
+    end: datetime = None,
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get a zero-filled revenue time series bucketed by day, week or month (staff only)."""
+    if end is None:
+        end = datetime.now()
+    if start is None:
+        start = (end - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    buckets = []
+    current = bucket_start(start.date(), granularity)
+    last = bucket_start(end.date(), granularity)
+    while current <= last:
+        buckets.append(current)
+        if len(buckets) > MAX_SERIES_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Range too large: at most {MAX_SERIES_BUCKETS} buckets per request"
+            )
+        current = next_bucket(current, granularity)
+
+    if end - start > timedelta(days=settings.ANALYTICS_RAW_SCAN_MAX_DAYS):
+        # Long ranges are bucketed from the daily rollup instead of scanning raw sales
+        totals = {}
+        for day, (revenue, sales) in rollup.get_daily_totals(db, start, end).items():
+            key = bucket_start(day, granularity)
+            current = totals.get(key, (0.0, 0))
+            totals[key] = (current[0] + revenue, current[1] + sales)
+    else:
+        totals = get_raw_series_totals(db, granularity, start, end)
+
+    points = []
+    for key in buckets:
+        revenue, sales = totals.get(key, (0.0, 0))
+        points.append(
+            RevenueSeriesPoint(
+                bucket_start=datetime.combine(key, datetime.min.time()),
+                total_revenue=round(revenue, 2),
+                total_sales=sales
+            )
+        )
+
+    return RevenueSeries(
+        granularity=granularity,
+        start_date=start,
+        end_date=end,
+        points=points
+    )
 
 
 @router.get("/revenue/comparison", response_model=RevenuePeriodComparison)
@@ -80,38 +305,44 @@ def compare_revenue(
     period: str = Query(..., enum=["daily", "weekly", "monthly", "annual"]),
     date1: datetime = None,
     date2: datetime = None,
-    db: Session = Depends(deps.get_db),
+    periods: int = Query(1, ge=1, le=36, description="Number of preceding periods to compare against when date2 is not given"),
+    db: Session = Depends(deps.get_analytics_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
-    """Compare revenue between two periods (staff only)."""
+    """Compare revenue of a period against another or against its preceding periods (staff only)."""
     if date1 is None:
         date1 = datetime.now()
-    if date2 is None:
-        if period == "daily":
-            date2 = date1 - timedelta(days=1)
-        elif period == "weekly":
-            date2 = date1 - timedelta(weeks=1)
-        elif period == "monthly":
-            if date1.month == 1:
-                date2 = date1.replace(year=date1.year - 1, month=12)
-            else:
-                date2 = date1.replace(month=date1.month - 1)
-        else:  # annual
-            date2 = date1.replace(year=date1.year - 1)
-    
-    period1 = get_revenue_data(db, date1, date1, period)
-    period2 = get_revenue_data(db, date2, date2, period)
-    
-    revenue_change = ((period1.total_revenue - period2.total_revenue) / period2.total_revenue * 100
-                     if period2.total_revenue > 0 else 0)
-    sales_change = ((period1.total_sales - period2.total_sales) / period2.total_sales * 100
-                   if period2.total_sales > 0 else 0)
-    
-    return RevenuePeriodComparison(
-        period_1=period1,
-        period_2=period2,
-        revenue_change_percentage=revenue_change,
-        sales_change_percentage=sales_change
+    
+    windows = [get_period_bounds(period, date1)]
+    if date2 is not None:
+        windows.append(get_period_bounds(period, date2))
+    else:
+        for _ in range(periods):
+            # The day before a period's start always falls in the preceding period
+            windows.append(get_period_bounds(period, windows[-1][0] - timedelta(days=1)))
+    
+    def compute():
+        results = get_revenue_data_for_periods(db, windows, period)
+        period1, period2 = results[0], results[1]
+        
+        revenue_change = ((period1.total_revenue - period2.total_revenue) / period2.total_revenue * 100
+                         if period2.total_revenue > 0 else 0)
+        sales_change = ((period1.total_sales - period2.total_sales) / period2.total_sales * 100
+                       if period2.total_sales > 0 else 0)
+        
+        return RevenuePeriodComparison(
+            period_1=period1,
+            period_2=period2,
+            revenue_change_percentage=revenue_change,
+            sales_change_percentage=sales_change,
+            previous_periods=results[1:]
+        )
+    
+    return analytics_cache.cache.get_or_compute(
+        ("comparison", period, tuple(windows)),
+        min(start for start, _ in windows),
+        max(end for _, end in windows),
+        compute
     )
 
 
@@ -119,50 +350,289 @@ def compare_revenue(
 def get_category_revenue(
     start_date: datetime = None,
     end_date: datetime = None,
-    db: Session = Depends(deps.get_db),
+    top_n: Optional[int] = Query(None, ge=1, description="Only return the N highest-revenue categories"),
+    min_share: Optional[float] = Query(None, ge=0, le=100, description="Only return categories with at least this percentage of total revenue"),
+    db: Session = Depends(deps.get_analytics_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
-    """Get revenue breakdown by category (staff only)."""
+    """Get revenue breakdown by category, highest revenue first (staff only)."""
+    if start_date is None:
+        start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if end_date is None:
+        # No sale can be dated in the future, so "until now" and "until the end of
+        # today" select the same rows; using the latter keeps the cache key stable.
+        end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    
+    return analytics_cache.cache.get_or_compute(
+        ("categories", start_date, end_date, top_n, min_share),
+        start_date,
+        end_date,
+        lambda: compute_category_revenue(db, start_date, end_date, top_n, min_share)
+    )
+
+
+def get_top_items(
+    db: Session,
+    kind: str,
+    key_column,
+    start_date: datetime,
+    end_date: datetime,
+    limit: int,
+    exact: bool,
+    rollup_totals: Optional[Callable[[Session, datetime, datetime], Dict[int, Tuple[float, int]]]] = None
+) -> TopItemsResponse:
+    """Helper function returning the highest-revenue keys from the sketches or from SQL.
+
+    Sketch answers are bucketed by day, so the range is widened to whole days.
+    Exact answers over more than ANALYTICS_RAW_SCAN_MAX_DAYS come from
+    rollup_totals, or are rejected for keys the rollup does not track.
+    """
+    if exact and end_date - start_date > timedelta(days=settings.ANALYTICS_RAW_SCAN_MAX_DAYS):
+        # Scanning this many raw sales would not fit the analytics query budget
+        if rollup_totals is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Exact results are limited to {settings.ANALYTICS_RAW_SCAN_MAX_DAYS} days; "
+                       "use exact=false for longer ranges"
+            )
+        totals = rollup_totals(db, start_date, end_date)
+        ranked = sorted(totals.items(), key=lambda entry: entry[1][0], reverse=True)[:limit]
+        items = [TopItem(id=key, total_revenue=round(revenue, 2)) for key, (revenue, sales) in ranked]
+    elif exact:
+        revenue = func.sum(SaleModel.total_amount)
+        rows = db.query(
+            key_column.label("id"),
+            revenue.label("revenue")
+        ).filter(
+            SaleModel.sale_date >= start_date,
+            SaleModel.sale_date <= end_date
+        ).group_by(key_column).order_by(revenue.desc()).limit(limit).all()
+        items = [TopItem(id=row.id, total_revenue=round(float(row.revenue or 0), 2)) for row in rows]
+    else:
+        sketch = sketch_store.store.merged(db, kind, start_date.date(), end_date.date())
+        items = [
+            TopItem(id=key, total_revenue=round(count, 2), max_error=round(error, 2))
+            for key, count, error in sketch.top(limit)
+        ]
+    
+    return TopItemsResponse(
+        start_date=start_date,
+        end_date=end_date,
+        exact=exact,
+        items=items
+    )
+
+
+@router.get("/top-products", response_model=TopItemsResponse)
+def get_top_products(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = Query(10, ge=1, le=100),
+    exact: bool = Query(False, description="Compute from the sale table (the daily rollup for long ranges) instead of the top-k sketches"),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get the best-selling products by revenue (staff only)."""
     if start_date is None:
         start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     if end_date is None:
         end_date = datetime.now()
     
-    # Get total revenue for the period
-    total_revenue_result = db.query(
-        func.sum(SaleModel.total_amount).label("total")
-    ).filter(
-        SaleModel.sale_date >= start_date,
-        SaleModel.sale_date <= end_date
-    ).scalar()
+    return get_top_items(
+        db, "top_products", SaleModel.product_id, start_date, end_date, limit, exact,
+        rollup_totals=rollup.get_product_totals
+    )
+
+
+@router.get("/top-customers", response_model=TopItemsResponse)
+def get_top_customers(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = Query(10, ge=1, le=100),
+    exact: bool = Query(False, description="Compute from the sale table instead of the top-k sketches; limited to ANALYTICS_RAW_SCAN_MAX_DAYS"),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get the customers with the highest spend (staff only)."""
+    if start_date is None:
+        start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if end_date is None:
+        end_date = datetime.now()
+    
+    return get_top_items(db, "top_customers", SaleModel.customer_id, start_date, end_date, limit, exact)
+
+
+@router.get("/order-value/percentiles", response_model=OrderValuePercentiles)
+def get_order_value_percentiles(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    q: List[float] = Query([50, 90, 99], description="Percentiles to estimate, between 0 and 100"),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get percentiles of delivered (or returned) order totals from the per-day t-digests, bucketed by order day (staff only)."""
+    if any(p < 0 or p > 100 for p in q):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    if start_date is None:
+        start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if end_date is None:
+        end_date = datetime.now()
     
-    total_revenue = float(total_revenue_result or 0)
+    digest = sketch_store.store.merged(db, "order_value", start_date.date(), end_date.date())
+    total_orders = int(round(digest.total_weight))
     
-    # Get revenue by category
-    category_revenues = db.query(
-        CategoryModel.id,
-        CategoryModel.name,
-        func.sum(SaleModel.total_amount).label("revenue"),
-        func.count(SaleModel.id).label("sales")
-    ).join(
-        ProductModel, ProductModel.category_id == CategoryModel.id
-    ).join(
-        SaleModel, SaleModel.product_id == ProductModel.id
+    return OrderValuePercentiles(
+        start_date=start_date,
+        end_date=end_date,
+        total_orders=total_orders,
+        percentiles=[
+            PercentileValue(
+                percentile=p,
+                value=round(digest.quantile(p / 100), 2) if total_orders else 0
+            )
+            for p in q
+        ]
+    )
+
+
+@router.get("/cache/stats", response_model=AnalyticsCacheStats)
+def get_cache_stats(
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get hit/miss counters of the analytics result cache (staff only)."""
+    return analytics_cache.cache.stats()
+
+
+@router.get("/rollups/status", response_model=RollupStatus)
+def get_rollup_status(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get the period rollup watermark and this worker's scheduler metrics (staff only)."""
+    watermark = rollup.get_period_watermark(db)
+    last_closed = date.today() - timedelta(days=1)
+    lag_days = max((last_closed - watermark).days, 0) if watermark is not None else None
+    return RollupStatus(watermark=watermark, lag_days=lag_days, **scheduler.stats())
+
+
+@router.get("/query-budgets", response_model=QueryBudgetStats)
+def get_query_budgets(
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Get the statement budgets and this worker's timeout counters (staff only)."""
+    return QueryBudgetStats(
+        analytics_ms=settings.QUERY_BUDGET_ANALYTICS_MS,
+        list_ms=settings.QUERY_BUDGET_LIST_MS,
+        crud_ms=settings.QUERY_BUDGET_CRUD_MS,
+        timeouts=dict(query_timeouts)
+    )
+
+
+def compute_category_revenue(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    top_n: Optional[int] = None,
+    min_share: Optional[float] = None
+) -> List[CategoryRevenue]:
+    """Helper function to calculate the revenue breakdown by category.
+
+    The grand total comes from a window over the grouped rows, so the period is
+    scanned once; top_n and min_share are applied by the database.
+    """
+    if sales_cube.use_cube("categories"):
+        return compute_category_revenue_from_cube(db, start_date, end_date, top_n, min_share)
+    if end_date - start_date > timedelta(days=settings.ANALYTICS_RAW_SCAN_MAX_DAYS):
+        # Scanning this many raw sales would not fit the analytics query budget
+        breakdown = rollup.get_category_totals(db, start_date, end_date)
+        return rank_category_breakdown(db, breakdown, top_n, min_share)
+    
+    revenue = func.sum(SaleModel.total_amount)
+    grouped = db.query(
+        SaleModel.category_id.label("id"),
+        revenue.label("revenue"),
+        func.count(SaleModel.id).label("sales"),
+        func.sum(revenue).over().label("grand_total")
     ).filter(
         SaleModel.sale_date >= start_date,
         SaleModel.sale_date <= end_date
     ).group_by(
-        CategoryModel.id,
-        CategoryModel.name
-    ).all()
+        SaleModel.category_id
+    ).subquery()
+    
+    # The window has to be evaluated before categories are filtered out, hence the subquery;
+    # category names are only joined onto the grouped rows
+    query = db.query(
+        grouped.c.id,
+        CategoryModel.name,
+        grouped.c.revenue,
+        grouped.c.sales,
+        grouped.c.grand_total
+    ).select_from(grouped).join(
+        CategoryModel, CategoryModel.id == grouped.c.id
+    )
+    if min_share is not None:
+        query = query.filter(grouped.c.revenue * 100 >= grouped.c.grand_total * min_share)
+    query = query.order_by(grouped.c.revenue.desc())
+    if top_n is not None:
+        query = query.limit(top_n)
+    
+    category_revenues = query.all()
     
     return [
         CategoryRevenue(
             category_id=cat.id,
             category_name=cat.name,
-            total_revenue=float(cat.revenue or 0),
+            total_revenue=round(float(cat.revenue or 0), 2),
             total_sales=int(cat.sales or 0),
-            percentage_of_total=(float(cat.revenue or 0) / total_revenue * 100 if total_revenue > 0 else 0)
+            percentage_of_total=(float(cat.revenue or 0) / float(cat.grand_total) * 100 if cat.grand_total else 0)
         )
         for cat in category_revenues
-    ] 
\ No newline at end of file
+    ]
+
+
+def compute_category_revenue_from_cube(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    top_n: Optional[int] = None,
+    min_share: Optional[float] = None
+) -> List[CategoryRevenue]:
+    """Helper function to calculate the revenue breakdown by category from the sales cube."""
+    breakdown = sales_cube.get_cube(db).category_breakdown(start_date, end_date)
+    return rank_category_breakdown(db, breakdown, top_n, min_share)
+
+
+def rank_category_breakdown(
+    db: Session,
+    breakdown: Dict[int, Tuple[float, int]],
+    top_n: Optional[int] = None,
+    min_share: Optional[float] = None
+) -> List[CategoryRevenue]:
+    """Helper function to rank per-category (revenue, sales) totals computed outside SQL."""
+    if not breakdown:
+        return []
+    
+    grand_total = sum(revenue for revenue, _ in breakdown.values())
+    names = dict(
+        db.query(CategoryModel.id, CategoryModel.name)
+        .filter(CategoryModel.id.in_(breakdown.keys()))
+        .all()
+    )
+    
+    rows = sorted(breakdown.items(), key=lambda item: item[1][0], reverse=True)
+    if min_share is not None:
+        rows = [row for row in rows if row[1][0] * 100 >= grand_total * min_share]
+    if top_n is not None:
+        rows = rows[:top_n]
+    
+    return [
+        CategoryRevenue(
+            category_id=category_id,
+            category_name=names.get(category_id, ""),
+            total_revenue=round(revenue, 2),
+            total_sales=sales,
+            percentage_of_total=(revenue / grand_total * 100 if grand_total > 0 else 0)
+        )
+        for category_id, (revenue, sales) in rows
+    ]
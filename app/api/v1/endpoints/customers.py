@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.api import deps
+from app.api.pagination import paginate, set_next_cursor
 from app.schemas.customer import (
     Customer, CustomerCreate, CustomerUpdate,
     CustomerWithOrders
@@ -58,10 +59,12 @@ def create_customer(
 
 @router.get("/", response_model=List[Customer])
 def get_customers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
     search: str = None,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_list_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Get all customers (staff only)."""
@@ -75,7 +78,9 @@ def get_customers(
             (CustomerModel.phone.ilike(search_filter))
         )
     
-    return query.offset(skip).limit(limit).all()
+    customers, next_cursor = paginate(query, [CustomerModel.id], skip, limit, cursor)
+    set_next_cursor(response, next_cursor)
+    return customers
 
 
 @router.get("/me", response_model=CustomerWithOrders)
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.api import deps
+from app.api.pagination import paginate, set_next_cursor
+from app.core.config import settings
+from app.services import reservations
 from app.schemas.inventory import (
-    Inventory, InventoryCreate, InventoryUpdate,
+    Inventory, InventoryCreate, InventoryUpdate, InventoryAvailability,
     InventoryHistory, InventoryHistoryCreate, InventoryWithHistory
 )
 from app.models import User, Inventory as InventoryModel, Product as ProductModel, InventoryHistory as InventoryHistoryModel
@@ -39,10 +43,12 @@ def create_inventory(
 
 @router.get("/", response_model=List[Inventory])
 def get_inventories(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
     low_stock: bool = False,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_list_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Get all inventory records with optional low stock filter (staff only)."""
@@ -51,7 +57,29 @@ def get_inventories(
     if low_stock:
         query = query.filter(InventoryModel.quantity <= InventoryModel.low_stock_threshold)
     
-    return query.offset(skip).limit(limit).all()
+    inventories, next_cursor = paginate(query, [InventoryModel.id], skip, limit, cursor)
+    set_next_cursor(response, next_cursor)
+    return inventories
+
+
+@router.get("/availability", response_model=List[InventoryAvailability])
+def get_availability(
+    product_ids: List[int] = Query(..., description="Products to look up; repeat the parameter for each"),
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """Get the stock still available to order (quantity minus reservations) for products."""
+    if len(product_ids) > settings.AVAILABILITY_MAX_PRODUCTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.AVAILABILITY_MAX_PRODUCTS} products per request"
+        )
+    available = reservations.available(db, product_ids)
+    # Products without inventory have nothing to sell
+    return [
+        InventoryAvailability(product_id=product_id, available=available.get(product_id, 0))
+        for product_id in dict.fromkeys(product_ids)
+    ]
 
 
 @router.get("/{inventory_id}", response_model=InventoryWithHistory)
@@ -88,7 +116,8 @@ def update_inventory(
         history_record = InventoryHistoryModel(
             inventory_id=inventory_id,
             quantity_change=quantity_change,
-            reason=reason
+            reason=reason,
+            timestamp=datetime.now().replace(microsecond=0)
         )
         db.add(history_record)
     
@@ -104,9 +133,13 @@ def update_inventory(
 @router.get("/{inventory_id}/history", response_model=List[InventoryHistory])
 def get_inventory_history(
     inventory_id: int,
+    response: Response,
+    start_date: datetime = None,
+    end_date: datetime = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
+    db: Session = Depends(deps.get_list_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Get the history of changes for a specific inventory record (staff only)."""
@@ -115,11 +148,20 @@ def get_inventory_history(
     if not inventory:
         raise HTTPException(status_code=404, detail="Inventory not found")
     
-    history = db.query(InventoryHistoryModel)\
-        .filter(InventoryHistoryModel.inventory_id == inventory_id)\
-        .order_by(InventoryHistoryModel.timestamp.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
+    query = db.query(InventoryHistoryModel)\
+        .filter(InventoryHistoryModel.inventory_id == inventory_id)
+    # Bounds on the partitioning column let MySQL skip the other months
+    if start_date:
+        query = query.filter(InventoryHistoryModel.timestamp >= start_date)
+    if end_date:
+        query = query.filter(InventoryHistoryModel.timestamp <= end_date)
+    history, next_cursor = paginate(
+        query,
+        [InventoryHistoryModel.timestamp, InventoryHistoryModel.id],
+        skip,
+        limit,
+        cursor,
+        descending=True
+    )
+    set_next_cursor(response, next_cursor)
     return history 
\ No newline at end of file
@@ -1,36 +1,178 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, delete, func, insert, update
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from app.api import deps
+from app.core.config import settings
+from app.api.pagination import cached_count, estimate_table_rows, paginate
+from app.services import order_payments, product_cache, reservations, sketch_store
 from app.schemas.order import (
     Order, OrderCreate, OrderUpdate,
-    OrderResponse, OrderListResponse
+    OrderResponse, OrderListResponse, OrderListItem,
+    OrderStatusBatch, OrderStatusBatchResult
 )
 from app.models import (
     User, Order as OrderModel,
     Customer as CustomerModel,
     OrderItem as OrderItemModel,
-    Product as ProductModel,
     Payment as PaymentModel,
-    OrderStatus, PaymentStatus
+    OrderStatus, PaymentStatus, UserRole
 )
 
 router = APIRouter()
 
+# Statuses an order may move to from each status
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PROCESSING, OrderStatus.CANCELLED},
+    OrderStatus.PROCESSING: {OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED, OrderStatus.RETURNED},
+    OrderStatus.DELIVERED: {OrderStatus.RETURNED},
+    OrderStatus.CANCELLED: set(),
+    OrderStatus.RETURNED: set(),
+}
 
-def calculate_payment_status(order: OrderModel) -> PaymentStatus:
-    """Helper function to calculate payment status from order payments."""
-    if not order.payments:
-        return PaymentStatus.PENDING
+# Statuses in which an order holds stock reservations for its items; moving
+# to any other status releases what is left of them. No transition leads back
+# into these statuses, so a released order never needs its stock again.
+RESERVING_STATUSES = {OrderStatus.PENDING, OrderStatus.PROCESSING}
+
+
+def adjust_reservations(db: Session, order_id: int, changes: Dict[int, int]) -> None:
+    """Change an order's reservations by {product_id: quantity change}, rejecting the request if any product is short."""
+    short = reservations.adjust(db, order_id, changes)
+    if short:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient inventory for products: {', '.join(str(product_id) for product_id in short)}"
+        )
+
+
+def lookup_products(db: Session, product_ids) -> Dict[int, product_cache.CachedProduct]:
+    """Resolve products at once through the product cache; unknown ids are reported together in a single 404."""
+    products = product_cache.cache.get_many(db, product_ids)
+    missing = sorted(set(product_ids) - products.keys())
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Products not found: {', '.join(str(product_id) for product_id in missing)}"
+        )
+    return products
+
+
+def price_items(db: Session, items) -> List[Dict]:
+    """Return order item lines (product_id, quantity, unit_price, total_price dicts) at current product prices.
+
+    The unit and total prices sent by the client are ignored.
+    """
+    products = lookup_products(db, [item.product_id for item in items])
+    return [
+        {
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "unit_price": products[item.product_id].price,
+            "total_price": round(products[item.product_id].price * item.quantity, 2)
+        }
+        for item in items
+    ]
+
+
+def insert_items(db: Session, order_id: int, lines: List[Dict]) -> None:
+    """Add order items (product_id, quantity, unit_price, total_price dicts) with one multi-row INSERT."""
+    db.execute(insert(OrderItemModel), [{"order_id": order_id, **line} for line in lines])
+
+
+def apply_item_diff(db: Session, order_id: int, items) -> Tuple[float, Dict[int, int]]:
+    """Make the order's items match items, keyed by product.
+
+    Returns the change in subtotal and the change in quantity per product.
+
+    Lines for the same product are combined. Only changed items are written:
+    one UPDATE for the changed ones, one INSERT for new products and one
+    DELETE for dropped products (and stray duplicate rows). Prices are the
+    server's, never the client's: added units are priced at the current
+    product price and removed units at the average unit price stored on the
+    product's rows. The subtotal moves by exactly the change in the rows'
+    total prices, so it keeps matching the items.
+    """
+    wanted: Dict[int, int] = {}
+    for item in items:
+        wanted[item.product_id] = wanted.get(item.product_id, 0) + item.quantity
     
-    total_paid = sum(payment.amount for payment in order.payments if payment.status == PaymentStatus.COMPLETED)
+    existing = {}
+    old_quantities: Dict[int, int] = {}
+    old_totals: Dict[int, float] = {}
+    removed = []
+    for row in db.query(
+        OrderItemModel.id, OrderItemModel.product_id, OrderItemModel.quantity,
+        OrderItemModel.unit_price, OrderItemModel.total_price
+    ).filter(OrderItemModel.order_id == order_id).order_by(OrderItemModel.id):
+        old_quantities[row.product_id] = old_quantities.get(row.product_id, 0) + row.quantity
+        old_totals[row.product_id] = old_totals.get(row.product_id, 0.0) + float(row.total_price)
+        if row.product_id not in wanted or row.product_id in existing:
+            removed.append(row.id)
+        else:
+            existing[row.product_id] = row
     
-    if total_paid >= order.total:
-        return PaymentStatus.COMPLETED
-    elif total_paid > 0:
-        return PaymentStatus.PARTIAL
-    else:
-        return PaymentStatus.PENDING
+    deltas = {
+        product_id: wanted.get(product_id, 0) - old_quantities.get(product_id, 0)
+        for product_id in set(wanted) | set(old_quantities)
+    }
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    # New products are checked even when their quantity is zero
+    products = lookup_products(
+        db,
+        list({product_id for product_id, delta in deltas.items() if delta > 0} | (set(wanted) - set(existing)))
+    )
+    
+    lines: Dict[int, Dict] = {}
+    for product_id, quantity in wanted.items():
+        delta = deltas.get(product_id, 0)
+        total_price = old_totals.get(product_id, 0.0)
+        if delta > 0:
+            total_price += products[product_id].price * delta
+        elif delta < 0:
+            total_price = total_price * quantity / old_quantities[product_id]
+        total_price = round(total_price, 2)
+        if quantity:
+            unit_price = round(total_price / quantity, 2)
+        elif product_id in existing:
+            unit_price = float(existing[product_id].unit_price)
+        else:
+            unit_price = products[product_id].price
+        lines[product_id] = {
+            "product_id": product_id, "quantity": quantity, "unit_price": unit_price, "total_price": total_price
+        }
+    
+    changed = {
+        row.id: lines[product_id] for product_id, row in existing.items()
+        if (row.quantity, float(row.unit_price), float(row.total_price)) != (
+            lines[product_id]["quantity"], lines[product_id]["unit_price"], lines[product_id]["total_price"]
+        )
+    }
+    new = [line for product_id, line in lines.items() if product_id not in existing]
+    
+    if changed:
+        db.execute(
+            update(OrderItemModel).where(
+                OrderItemModel.id.in_(list(changed))
+            ).values(
+                quantity=case({item_id: line["quantity"] for item_id, line in changed.items()}, value=OrderItemModel.id),
+                unit_price=case({item_id: line["unit_price"] for item_id, line in changed.items()}, value=OrderItemModel.id),
+                total_price=case({item_id: line["total_price"] for item_id, line in changed.items()}, value=OrderItemModel.id)
+            ).execution_options(synchronize_session=False)
+        )
+    if new:
+        insert_items(db, order_id, new)
+    if removed:
+        db.execute(
+            delete(OrderItemModel).where(
+                OrderItemModel.id.in_(removed)
+            ).execution_options(synchronize_session=False)
+        )
+    
+    change = sum(line["total_price"] for line in lines.values()) - sum(old_totals.values())
+    return change, deltas
 
 
 @router.post("/", response_model=OrderResponse)
@@ -45,17 +187,12 @@ def create_order(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    if customer.user_id != current_user.id and not current_user.is_staff:
+    if customer.user_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.STAFF]:
         raise HTTPException(status_code=403, detail="Not authorized to create order for this customer")
     
     # Calculate order totals
-    subtotal = 0
-    for item in order.items:
-        product = db.query(ProductModel).filter(ProductModel.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        item_total = product.price * item.quantity
-        subtotal += item_total
+    lines = price_items(db, order.items)
+    subtotal = sum(line["total_price"] for line in lines)
     
     # Create order
     db_order = OrderModel(
@@ -73,23 +210,20 @@ def create_order(
     db.flush()  # Get order ID without committing
     
     # Create order items
+    insert_items(db, db_order.id, lines)
+    
+    # Hold the stock until the order is sold, cancelled or the reservation expires
+    quantities: Dict[int, int] = {}
     for item in order.items:
-        db_item = OrderItemModel(
-            order_id=db_order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            total_price=item.total_price
-        )
-        db.add(db_item)
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    adjust_reservations(db, db_order.id, quantities)
     
     db.commit()
     db.refresh(db_order)
     
     return OrderResponse(
         **db_order.__dict__,
-        total_items=len(order.items),
-        payment_status=PaymentStatus.PENDING
+        total_items=len(order.items)
     )
 
 
@@ -97,42 +231,63 @@ def create_order(
 def get_orders(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
     customer_id: int = None,
     status: OrderStatus = None,
+    payment_status: PaymentStatus = None,
+    total: bool = Query(True, description="Set to false to skip counting the matching orders"),
+    estimate: bool = Query(False, description="Staff listing all orders: estimate the total from table statistics"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """Get all orders with optional filtering."""
-    query = db.query(OrderModel).options(
-        joinedload(OrderModel.items),
-        joinedload(OrderModel.payments)
-    )
+    is_staff = current_user.role in [UserRole.ADMIN, UserRole.STAFF]
+    filters = []
     
     # Filter by customer if specified or if regular user
     if customer_id:
-        query = query.filter(OrderModel.customer_id == customer_id)
-    elif not current_user.is_staff:
+        filters.append(OrderModel.customer_id == customer_id)
+    elif not is_staff:
         # Regular users can only see their own orders
         customer = db.query(CustomerModel).filter(CustomerModel.user_id == current_user.id).first()
         if not customer:
             raise HTTPException(status_code=404, detail="Customer profile not found")
-        query = query.filter(OrderModel.customer_id == customer.id)
+        filters.append(OrderModel.customer_id == customer.id)
     
     if status:
-        query = query.filter(OrderModel.status == status)
+        filters.append(OrderModel.status == status)
+    if payment_status:
+        filters.append(OrderModel.payment_status == payment_status)
     
-    total = query.count()
-    orders = query.order_by(OrderModel.created_at.desc()).offset(skip).limit(limit).all()
+    # Count with a bare COUNT(*); the eager load below only matters for the page itself
+    count = None
+    total_is_estimate = False
+    if total:
+        if estimate and is_staff and not filters:
+            count = estimate_table_rows(db, OrderModel.__tablename__)
+            total_is_estimate = True
+        else:
+            count = cached_count(
+                ("orders", current_user.id, customer_id, status, payment_status),
+                lambda: db.query(func.count()).select_from(OrderModel).filter(*filters).scalar()
+            )
+    
+    # Payment status is stored on the order, so payments are not loaded
+    query = db.query(OrderModel).options(
+        joinedload(OrderModel.order_items)
+    ).filter(*filters)
+    orders, next_cursor = paginate(query, [OrderModel.order_date, OrderModel.id], skip, limit, cursor, descending=True)
     
     return OrderListResponse(
-        total=total,
+        total=count,
+        total_is_estimate=total_is_estimate,
         page=skip // limit + 1,
         size=limit,
+        next_cursor=next_cursor,
         orders=[
-            OrderResponse(
+            OrderListItem(
                 **order.__dict__,
-                total_items=len(order.items),
-                payment_status=calculate_payment_status(order)
+                total_items=len(order.order_items)
             )
             for order in orders
         ]
@@ -147,22 +302,21 @@ def get_order(
 ):
     """Get a specific order."""
     order = db.query(OrderModel).options(
-        joinedload(OrderModel.items),
+        joinedload(OrderModel.order_items),
         joinedload(OrderModel.payments)
     ).filter(OrderModel.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Check permission
-    if not current_user.is_staff:
+    if current_user.role not in [UserRole.ADMIN, UserRole.STAFF]:
         customer = db.query(CustomerModel).filter(CustomerModel.user_id == current_user.id).first()
         if not customer or order.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Not authorized to view this order")
     
     return OrderResponse(
         **order.__dict__,
-        total_items=len(order.items),
-        payment_status=calculate_payment_status(order)
+        total_items=len(order.order_items)
     )
 
 
@@ -174,53 +328,135 @@ def update_order(
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Update an order (staff only)."""
-    db_order = db.query(OrderModel).options(
-        joinedload(OrderModel.items),
-        joinedload(OrderModel.payments)
-    ).filter(OrderModel.id == order_id).first()
+    # Lock the order so the subtotal adjustment cannot race a concurrent sale
+    db_order = db.query(OrderModel).filter(OrderModel.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    update_data = order_update.model_dump(exclude={'items'}, exclude_unset=True)
+    previous_status = db_order.status
+    status = update_data.get("status", previous_status)
+    # Same rules as the batch status endpoint
+    if status != previous_status and status not in ORDER_STATUS_TRANSITIONS[previous_status]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot move an order from {previous_status.value} to {status.value}"
+        )
+    
     # Update order items if provided
     if order_update.items:
-        # Remove existing items
-        db.query(OrderItemModel).filter(OrderItemModel.order_id == order_id).delete()
-        
-        # Add new items
-        subtotal = 0
-        for item in order_update.items:
-            product = db.query(ProductModel).filter(ProductModel.id == item.product_id).first()
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-            
-            item_total = product.price * item.quantity
-            subtotal += item_total
-            
-            db_item = OrderItemModel(
-                order_id=order_id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                total_price=item.total_price
-            )
-            db.add(db_item)
-        
-        # Update order totals
-        db_order.subtotal = subtotal
-        db_order.total = subtotal + db_order.shipping_cost + db_order.tax
+        subtotal_change, quantity_changes = apply_item_diff(db, order_id, order_update.items)
+        db_order.subtotal += subtotal_change
+        db_order.total = db_order.subtotal + db_order.shipping_cost + db_order.tax
+        # Reservations cover what sales have not filled yet, so move them by the same amounts
+        if status in RESERVING_STATUSES:
+            adjust_reservations(db, order_id, quantity_changes)
     
     # Update other fields
-    update_data = order_update.model_dump(exclude={'items'}, exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_order, field, value)
     
+    # Give back the stock still held once the order is shipped, cancelled or otherwise done
+    if status not in RESERVING_STATUSES:
+        reservations.release_orders(db, [order_id])
+    db_order.payment_status = order_payments.payment_status_for(db_order.amount_paid or 0, db_order.total)
+    
     db.commit()
     db.refresh(db_order)
+    # The response includes the payments, which the locking read above did not load
+    db.refresh(db_order, ["payments"])
+    
+    # Feed the order value percentiles with the final total once the order is fulfilled
+    if status in sketch_store.ORDER_VALUE_STATUSES and previous_status not in sketch_store.ORDER_VALUE_STATUSES:
+        sketch_store.store.record_order(db_order.order_date, db_order.total)
+        sketch_store.store.flush_if_due(db)
     
     return OrderResponse(
         **db_order.__dict__,
-        total_items=len(db_order.items),
-        payment_status=calculate_payment_status(db_order)
+        total_items=len(db_order.order_items)
+    )
+
+
+@router.post("/status:batch", response_model=OrderStatusBatchResult)
+def update_order_statuses(
+    batch: OrderStatusBatch,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Move a batch of orders to new statuses in one transaction, reporting the result of each line (staff only).
+
+    Transitions are checked against ORDER_STATUS_TRANSITIONS from one locking
+    read of the orders, and the changes are written with one UPDATE per
+    target status. Setting an order to the status it already has is accepted,
+    so a batch can be retried. Later lines for the same order see the status
+    set by earlier ones.
+    """
+    if not batch.orders:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(batch.orders) > settings.ORDER_STATUS_BATCH_MAX_LINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ORDER_STATUS_BATCH_MAX_LINES} orders per batch"
+        )
+    
+    # Lock in id order so concurrent batches cannot deadlock
+    current = dict(
+        db.query(OrderModel.id, OrderModel.status).filter(
+            OrderModel.id.in_(list({line.order_id for line in batch.orders}))
+        ).order_by(OrderModel.id).with_for_update().all()
+    )
+    
+    previous = dict(current)
+    results = []
+    targets: Dict[int, OrderStatus] = {}
+    tracking: Dict[int, str] = {}
+    for index, line in enumerate(batch.orders):
+        result = {"index": index, "order_id": line.order_id, "status": "updated", "error": None}
+        status = current.get(line.order_id)
+        if status is None:
+            result.update(status="rejected", error="Order not found")
+        elif line.status != status and line.status not in ORDER_STATUS_TRANSITIONS[status]:
+            result.update(status="rejected", error=f"Cannot move an order from {status.value} to {line.status.value}")
+        else:
+            current[line.order_id] = line.status
+            targets[line.order_id] = line.status
+            if line.tracking_number is not None:
+                tracking[line.order_id] = line.tracking_number
+        results.append(result)
+    
+    by_status: Dict[OrderStatus, List[int]] = {}
+    for order_id, status in targets.items():
+        by_status.setdefault(status, []).append(order_id)
+    reservations.release_orders(
+        db, [order_id for order_id, status in targets.items() if status not in RESERVING_STATUSES]
+    )
+    for status, order_ids in by_status.items():
+        values = {"status": status}
+        new_tracking = {order_id: tracking[order_id] for order_id in order_ids if order_id in tracking}
+        if new_tracking:
+            values["tracking_number"] = case(new_tracking, value=OrderModel.id, else_=OrderModel.tracking_number)
+        db.execute(
+            update(OrderModel).where(
+                OrderModel.id.in_(order_ids)
+            ).values(**values).execution_options(synchronize_session=False)
+        )
+    db.commit()
+    
+    # Feed the order value percentiles with the final totals of newly fulfilled orders
+    fulfilled = [
+        order_id for order_id, status in targets.items()
+        if status in sketch_store.ORDER_VALUE_STATUSES and previous[order_id] not in sketch_store.ORDER_VALUE_STATUSES
+    ]
+    if fulfilled:
+        for order_date, total in db.query(OrderModel.order_date, OrderModel.total).filter(OrderModel.id.in_(fulfilled)):
+            sketch_store.store.record_order(order_date, total)
+        sketch_store.store.flush_if_due(db)
+    
+    updated = sum(1 for result in results if result["status"] == "updated")
+    return OrderStatusBatchResult(
+        updated=updated,
+        rejected=len(results) - updated,
+        results=results
     )
 
 
@@ -231,12 +467,14 @@ def delete_order(
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Delete an order (staff only)."""
-    db_order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
+    # Lock the order before its inventory and items, like the sale endpoints
+    db_order = db.query(OrderModel).filter(OrderModel.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Delete associated order items first
+    # Delete associated order items and reservations first
     db.query(OrderItemModel).filter(OrderItemModel.order_id == order_id).delete()
+    reservations.release_orders(db, [order_id])
     
     # Delete associated payments
     db.query(PaymentModel).filter(PaymentModel.order_id == order_id).delete()
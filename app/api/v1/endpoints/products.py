@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.api import deps
+from app.api.pagination import paginate, set_next_cursor
 from app.schemas.product import Product, ProductCreate, ProductUpdate
 from app.models import User, Product as ProductModel
 
@@ -24,11 +25,13 @@ def create_product(
 
 @router.get("/", response_model=List[Product])
 def get_products(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
     category_id: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_list_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """Get all products with optional filtering."""
@@ -41,7 +44,9 @@ def get_products(
         search_filter = f"%{search}%"
         query = query.filter(ProductModel.name.ilike(search_filter))
     
-    return query.offset(skip).limit(limit).all()
+    products, next_cursor = paginate(query, [ProductModel.id], skip, limit, cursor)
+    set_next_cursor(response, next_cursor)
+    return products
 
 
 @router.get("/{product_id}", response_model=Product)
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, literal, select, update
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from app.api import deps
-from app.schemas.sale import Sale, SaleCreate, SaleUpdate
+from app.api.pagination import paginate, set_next_cursor
+from app.core.config import settings
+from app.db.session import get_read_session
+from app.services import order_payments, product_cache, reservations, rollup, sale_export, sale_ingest, sketch_store
+from app.schemas.sale import Sale, SaleCreate, SaleUpdate, SaleBulkCreate, SaleBulkResult
 from app.models import (
     User, Sale as SaleModel,
-    Product as ProductModel,
     Inventory as InventoryModel,
     InventoryHistory as InventoryHistoryModel,
     Order as OrderModel,
@@ -23,62 +28,112 @@ def create_sale(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
-    """Create a new sale record and update inventory (staff only)."""
-    # Check if order exists and belongs to the customer
-    order = db.query(OrderModel).filter(
-        OrderModel.id == sale.order_id,
-        OrderModel.customer_id == sale.customer_id
-    ).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found or doesn't belong to the customer")
+    """Create a new sale record and update inventory (staff only).
+
+    Stock, order item and order totals are changed with guarded in-place
+    UPDATEs instead of read-modify-write, so concurrent sales never lose an
+    update or oversell. Stock the order has reserved is consumed first; the
+    rest must come from unreserved stock. Rows are locked in the same order as
+    in the bulk endpoint and the order endpoints (order, inventory,
+    reservation, order item) to rule out deadlocks between them.
 
-    # Check if product exists and has enough inventory
-    product = db.query(ProductModel).filter(ProductModel.id == sale.product_id).first()
+    The product's category comes from the product cache, and the order is
+    checked and locked by its own UPDATE, so the only locking read left is
+    the inventory row's: it has to be locked before the reservation, and
+    the reservation read before the stock UPDATE that depends on it.
+    """
+    product = product_cache.cache.get_many(db, [sale.product_id]).get(sale.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    inventory = db.query(InventoryModel).filter(InventoryModel.product_id == sale.product_id).first()
+    # Add to the order total (MySQL assigns left to right, so total sees the new
+    # subtotal and the payment status the new total). Matching no row means the
+    # order does not exist or belongs to another customer.
+    result = db.execute(
+        update(OrderModel).where(
+            OrderModel.id == sale.order_id,
+            OrderModel.customer_id == sale.customer_id
+        ).ordered_values(
+            (OrderModel.subtotal, OrderModel.subtotal + sale.total_amount),
+            (OrderModel.total, OrderModel.subtotal + OrderModel.shipping_cost + OrderModel.tax),
+            (OrderModel.payment_status, order_payments.payment_status_case(OrderModel.amount_paid, OrderModel.total))
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Order not found or doesn't belong to the customer")
+    
+    inventory = db.query(InventoryModel.id).filter(
+        InventoryModel.product_id == sale.product_id
+    ).with_for_update().first()
     if not inventory:
         raise HTTPException(status_code=404, detail="Inventory not found")
     
-    if inventory.quantity < sale.quantity:
-        raise HTTPException(status_code=400, detail="Insufficient inventory")
+    # Use up the order's reservation before touching unreserved stock
+    held = reservations.lock_reservations(db, [(sale.order_id, sale.product_id)]).get((sale.order_id, sale.product_id))
+    from_reserved = min(sale.quantity, held[1]) if held else 0
     
+    # Take the stock only if enough is left; the row lock makes the check and the decrement atomic
+    result = db.execute(
+        update(InventoryModel).where(
+            InventoryModel.product_id == sale.product_id,
+            InventoryModel.quantity - InventoryModel.reserved >= sale.quantity - from_reserved
+        ).values(
+            quantity=InventoryModel.quantity - sale.quantity,
+            reserved=InventoryModel.reserved - from_reserved
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=400, detail="Insufficient inventory")
+    if held:
+        reservations.consume(db, {held[0]: from_reserved})
+
     # Create sale record
     db_sale = SaleModel(
         product_id=sale.product_id,
         order_id=sale.order_id,
         customer_id=sale.customer_id,
+        category_id=product.category_id,
         quantity=sale.quantity,
         unit_price=sale.unit_price,
         total_amount=sale.total_amount,
-        sale_date=datetime.now()
+        # Whole seconds, as stored; sale_date is part of the primary key
+        sale_date=datetime.now().replace(microsecond=0)
     )
     db.add(db_sale)
-    
-    # Update inventory
-    inventory.quantity -= sale.quantity
+
+    # Keep the daily analytics rollup in step with the sale
+    rollup.record_sale(
+        db,
+        sale_date=db_sale.sale_date,
+        product_id=sale.product_id,
+        category_id=product.category_id,
+        total_amount=float(sale.total_amount),
+        quantity=sale.quantity
+    )
     
     # Create inventory history record
-    history_record = InventoryHistoryModel(
-        inventory_id=inventory.id,
-        quantity_change=-sale.quantity,
-        reason=f"sale for order #{sale.order_id}"
+    db.execute(
+        insert(InventoryHistoryModel).from_select(
+            ["inventory_id", "quantity_change", "reason"],
+            select(
+                InventoryModel.id,
+                literal(-sale.quantity),
+                literal(f"sale for order #{sale.order_id}")
+            ).where(InventoryModel.product_id == sale.product_id)
+        )
     )
-    db.add(history_record)
-
-    # Create or update order item
-    order_item = db.query(OrderItemModel).filter(
-        OrderItemModel.order_id == sale.order_id,
-        OrderItemModel.product_id == sale.product_id
-    ).first()
-
-    if order_item:
-        # Update existing order item
-        order_item.quantity += sale.quantity
-        order_item.total_price += sale.total_amount
-    else:
-        # Create new order item
+
+    # Add to the existing order item, or create one
+    result = db.execute(
+        update(OrderItemModel).where(
+            OrderItemModel.order_id == sale.order_id,
+            OrderItemModel.product_id == sale.product_id
+        ).values(
+            quantity=OrderItemModel.quantity + sale.quantity,
+            total_price=OrderItemModel.total_price + sale.total_amount
+        ).with_dialect_options(mysql_limit=1).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
         order_item = OrderItemModel(
             order_id=sale.order_id,
             product_id=sale.product_id,
@@ -88,26 +143,63 @@ def create_sale(
         )
         db.add(order_item)
     
-    # Update order total
-    order.subtotal += sale.total_amount
-    order.total = order.subtotal + order.shipping_cost + order.tax
-    
     db.commit()
+
+    # Feed the top-k sketches only once the sale is durable
+    sketch_store.store.record_sale(
+        db_sale.sale_date, sale.product_id, sale.customer_id, sale.total_amount
+    )
+    sketch_store.store.flush_if_due(db)
+
     db.refresh(db_sale)
     return db_sale
 
 
+@router.post("/bulk", response_model=SaleBulkResult)
+def create_sales_bulk(
+    batch: SaleBulkCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Record a batch of sales in one transaction, reporting the status of each line (staff only)."""
+    if not batch.sales:
+        raise HTTPException(status_code=400, detail="No sales given")
+    if len(batch.sales) > settings.SALE_BULK_MAX_LINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SALE_BULK_MAX_LINES} sales per batch"
+        )
+    
+    sale_date, results = sale_ingest.ingest_sales(db, batch.sales)
+    db.commit()
+    
+    # Feed the top-k sketches only once the sales are durable
+    created = [batch.sales[result["index"]] for result in results if result["status"] == "created"]
+    for sale in created:
+        sketch_store.store.record_sale(sale_date, sale.product_id, sale.customer_id, sale.total_amount)
+    sketch_store.store.flush_if_due(db)
+    
+    return SaleBulkResult(
+        created=len(created),
+        rejected=len(results) - len(created),
+        sale_date=sale_date,
+        results=results
+    )
+
+
 @router.get("/", response_model=List[Sale])
 def get_sales(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
     start_date: datetime = None,
     end_date: datetime = None,
     product_id: int = None,
     category_id: int = None,
     customer_id: int = None,
     order_id: int = None,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_list_db),
     current_user: User = Depends(deps.get_current_active_staff)
 ):
     """Get sales records with optional filtering (staff only)."""
@@ -115,7 +207,23 @@ def get_sales(
         joinedload(SaleModel.order),
         joinedload(SaleModel.customer)
     )
+    query = filter_sales(query, start_date, end_date, product_id, category_id, customer_id, order_id)
     
+    sales, next_cursor = paginate(query, [SaleModel.sale_date, SaleModel.id], skip, limit, cursor, descending=True)
+    set_next_cursor(response, next_cursor)
+    return sales
+
+
+def filter_sales(
+    query,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    product_id: int = None,
+    category_id: int = None,
+    customer_id: int = None,
+    order_id: int = None
+):
+    """Apply the sale list filters to an ORM query or a select() statement."""
     if start_date:
         query = query.filter(SaleModel.sale_date >= start_date)
     if end_date:
@@ -123,13 +231,48 @@ def get_sales(
     if product_id:
         query = query.filter(SaleModel.product_id == product_id)
     if category_id:
-        query = query.join(ProductModel).filter(ProductModel.category_id == category_id)
+        query = query.filter(SaleModel.category_id == category_id)
     if customer_id:
         query = query.filter(SaleModel.customer_id == customer_id)
     if order_id:
         query = query.filter(SaleModel.order_id == order_id)
+    return query
+
+
+@router.get("/export")
+def export_sales(
+    format: str = Query("csv", enum=["csv", "ndjson", "parquet"]),
+    start_date: datetime = None,
+    end_date: datetime = None,
+    product_id: int = None,
+    category_id: int = None,
+    customer_id: int = None,
+    order_id: int = None,
+    current_user: User = Depends(deps.get_current_active_staff)
+):
+    """Stream all sales matching the list filters as CSV, NDJSON or Parquet (staff only)."""
+    if format == "parquet" and not sale_export.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
     
-    return query.order_by(SaleModel.sale_date.desc()).offset(skip).limit(limit).all()
+    statement = select(*[getattr(SaleModel, column) for column in sale_export.EXPORT_COLUMNS])
+    statement = filter_sales(statement, start_date, end_date, product_id, category_id, customer_id, order_id)
+    statement = statement.order_by(SaleModel.id)
+    
+    def content():
+        # The stream outlives the endpoint call, so it owns its session; exports
+        # are expected to run long and get no statement budget
+        db = get_read_session()
+        try:
+            batches = sale_export.iter_batches(db, statement, settings.EXPORT_BATCH_SIZE)
+            yield from sale_export.ENCODERS[format](batches)
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        content(),
+        media_type=sale_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="sales.{format}"'}
+    )
 
 
 @router.get("/{sale_id}", response_model=Sale)
@@ -16,10 +16,84 @@ class Settings(BaseModel):
     MYSQL_PORT: str = os.getenv("MYSQL_PORT", "3306")
     MYSQL_DATABASE: str = os.getenv("MYSQL_DATABASE", "ecommerce_admin")
     
+    # Read replicas: comma-separated "host" or "host:port" entries using the primary's credentials
+    MYSQL_REPLICA_HOSTS: List[str] = [
+        host.strip() for host in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",") if host.strip()
+    ]
+    REPLICA_MAX_LAG_SECONDS: int = int(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_HEALTH_CHECK_SECONDS: int = int(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+    
     # JWT settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     
+    # Analytics result cache
+    ANALYTICS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+    ANALYTICS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "1024"))
+    
+    # In-memory sales cube: comma-separated analytics endpoints served from the
+    # cube instead of SQL ("revenue", "comparison", "categories")
+    ANALYTICS_CUBE_ENDPOINTS: List[str] = [
+        endpoint.strip() for endpoint in os.getenv("ANALYTICS_CUBE_ENDPOINTS", "").split(",") if endpoint.strip()
+    ]
+    ANALYTICS_CUBE_REFRESH_SECONDS: int = int(os.getenv("ANALYTICS_CUBE_REFRESH_SECONDS", "5"))
+    ANALYTICS_CUBE_RELOAD_SECONDS: int = int(os.getenv("ANALYTICS_CUBE_RELOAD_SECONDS", "3600"))
+    # Tailing re-reads the sales dated this close to the newest one loaded, so
+    # sales that commit late are still picked up
+    ANALYTICS_CUBE_TAIL_OVERLAP_SECONDS: int = int(os.getenv("ANALYTICS_CUBE_TAIL_OVERLAP_SECONDS", "60"))
+    
+    # Per-day analytics sketches (top-k heavy hitters, distinct customers, order value quantiles)
+    TOP_K_SKETCH_CAPACITY: int = int(os.getenv("TOP_K_SKETCH_CAPACITY", "200"))
+    HLL_PRECISION: int = int(os.getenv("HLL_PRECISION", "12"))
+    TDIGEST_COMPRESSION: int = int(os.getenv("TDIGEST_COMPRESSION", "200"))
+    UNIQUE_CUSTOMERS_EXACT_MAX_DAYS: int = int(os.getenv("UNIQUE_CUSTOMERS_EXACT_MAX_DAYS", "31"))
+    SKETCH_FLUSH_SECONDS: int = int(os.getenv("SKETCH_FLUSH_SECONDS", "30"))
+    
+    # Background scheduler (period rollup folding); one worker leads through a lock row
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_INTERVAL_SECONDS: int = int(os.getenv("SCHEDULER_INTERVAL_SECONDS", "60"))
+    SCHEDULER_LOCK_TTL_SECONDS: int = int(os.getenv("SCHEDULER_LOCK_TTL_SECONDS", "180"))
+    
+    # Statement budgets (MySQL max_execution_time, ms) per endpoint class; 0 disables
+    QUERY_BUDGET_ANALYTICS_MS: int = int(os.getenv("QUERY_BUDGET_ANALYTICS_MS", "10000"))
+    QUERY_BUDGET_LIST_MS: int = int(os.getenv("QUERY_BUDGET_LIST_MS", "5000"))
+    QUERY_BUDGET_CRUD_MS: int = int(os.getenv("QUERY_BUDGET_CRUD_MS", "2000"))
+    QUERY_TIMEOUT_RETRY_AFTER_SECONDS: int = int(os.getenv("QUERY_TIMEOUT_RETRY_AFTER_SECONDS", "5"))
+    # Longer analytics ranges are answered from the daily rollup instead of raw sales
+    ANALYTICS_RAW_SCAN_MAX_DAYS: int = int(os.getenv("ANALYTICS_RAW_SCAN_MAX_DAYS", "31"))
+    
+    # Largest batch accepted by POST /sales/bulk
+    SALE_BULK_MAX_LINES: int = int(os.getenv("SALE_BULK_MAX_LINES", "5000"))
+    
+    # Largest batch accepted by POST /orders/status:batch
+    ORDER_STATUS_BATCH_MAX_LINES: int = int(os.getenv("ORDER_STATUS_BATCH_MAX_LINES", "1000"))
+    
+    # How long stock reserved by an order is held before the expiry job frees it
+    RESERVATION_TTL_SECONDS: int = int(os.getenv("RESERVATION_TTL_SECONDS", "1800"))
+    # Most product ids per GET /inventory/availability request
+    AVAILABILITY_MAX_PRODUCTS: int = int(os.getenv("AVAILABILITY_MAX_PRODUCTS", "100"))
+    
+    # Rows fetched and encoded per batch by /sales/export
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+    
+    # Monthly partitions of sale and inventory_history kept ready past the current month
+    PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    
+    # List totals are cached per filter and user for a few seconds
+    LIST_COUNT_CACHE_SECONDS: int = int(os.getenv("LIST_COUNT_CACHE_SECONDS", "5"))
+    LIST_COUNT_CACHE_MAX_ENTRIES: int = int(os.getenv("LIST_COUNT_CACHE_MAX_ENTRIES", "1000"))
+    
+    # Process-local product price cache used to price orders
+    PRODUCT_CACHE_MAX_ENTRIES: int = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000"))
+    PRODUCT_CACHE_TTL_SECONDS: int = int(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "60"))
+    
+    # Idempotency-Key handling for write requests: how long a stored response is replayed,
+    # how long a request holds its key without renewing it (renewed every third of that
+    # while it runs), and how long a duplicate waits for it
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+    IDEMPOTENCY_WAIT_SECONDS: int = int(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+    
     # CORS settings
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
     
@@ -29,6 +103,15 @@ class Settings(BaseModel):
         encoded_password = quote_plus(self.MYSQL_PASSWORD)
         return f"mysql+pymysql://{self.MYSQL_USER}:{encoded_password}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}"
 
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> List[str]:
+        encoded_password = quote_plus(self.MYSQL_PASSWORD)
+        uris = []
+        for replica in self.MYSQL_REPLICA_HOSTS:
+            host, _, port = replica.partition(":")
+            uris.append(f"mysql+pymysql://{self.MYSQL_USER}:{encoded_password}@{host}:{port or self.MYSQL_PORT}/{self.MYSQL_DATABASE}")
+        return uris
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     pool_pre_ping=True,
@@ -11,10 +18,137 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# Session.info key holding the statement budget (ms) applied as MySQL max_execution_time
+QUERY_BUDGET_KEY = "max_execution_time_ms"
+
+# MySQL error raised when a SELECT exceeds max_execution_time
+MAX_EXECUTION_TIME_EXCEEDED = 3024
+
+# Statements interrupted by their budget, per request path
+query_timeouts: Counter = Counter()
+
+
+def set_query_budget(db: Session, budget_ms: int) -> None:
+    """Limit every SELECT of the session's next transactions to budget_ms (0 = unlimited)."""
+    db.info[QUERY_BUDGET_KEY] = budget_ms
+
+
+@event.listens_for(Session, "after_begin")
+def apply_query_budget(session, transaction, connection):
+    # Pooled connections remember their current value, so SET only runs on a change
+    budget = session.info.get(QUERY_BUDGET_KEY, 0)
+    if connection.info.get(QUERY_BUDGET_KEY, 0) != budget:
+        connection.exec_driver_sql(f"SET SESSION max_execution_time = {int(budget)}")
+        connection.info[QUERY_BUDGET_KEY] = budget
+
+
+class Replica:
+    """One read replica with its cached health state."""
+
+    def __init__(self, uri: str):
+        self.engine = create_engine(
+            uri,
+            pool_pre_ping=True,
+            pool_size=10,
+            max_overflow=20
+        )
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = False
+        self.lag_seconds: Optional[int] = None
+        self.checked_at = 0.0
+
+    def check(self, max_lag_seconds: int) -> bool:
+        """Probe replication lag; a replica that is unreachable, not replicating or too far behind is unhealthy."""
+        try:
+            with self.engine.connect() as connection:
+                try:
+                    row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+                    lag_key = "Seconds_Behind_Source"
+                except Exception:
+                    # MySQL before 8.0.22
+                    row = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+                    lag_key = "Seconds_Behind_Master"
+            self.lag_seconds = row[lag_key] if row is not None else None
+            self.healthy = self.lag_seconds is not None and self.lag_seconds <= max_lag_seconds
+        except Exception:
+            logger.warning("Read replica %s is unreachable", self.engine.url.host, exc_info=True)
+            self.lag_seconds = None
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        return self.healthy
+
+
+class ReplicaPool:
+    """Round-robin selection over the healthy read replicas.
+
+    Health (reachability and replication lag) is probed every
+    ``check_seconds`` by a background thread, so choosing a replica never
+    waits on a probe. Until the pool is started, and whenever no replica is
+    healthy, callers fall back to the primary.
+    """
+
+    def __init__(self, uris: List[str], max_lag_seconds: int, check_seconds: int):
+        self.replicas = [Replica(uri) for uri in uris]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self._next = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check(self.max_lag_seconds)
+
+    def start(self) -> None:
+        """Probe the replicas once, then keep probing them in a background thread."""
+        if not self.replicas or self._thread is not None:
+            return
+        self.check_all()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_seconds):
+            self.check_all()
+
+    def choose(self) -> Optional[Replica]:
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas) if self.replicas else 0
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.healthy:
+                return replica
+        return None
+
+
+replicas = ReplicaPool(
+    settings.SQLALCHEMY_REPLICA_URIS,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_seconds=settings.REPLICA_HEALTH_CHECK_SECONDS
+)
+
+
+def get_read_session():
+    """Open a session on a healthy read replica, or on the primary if there is none."""
+    replica = replicas.choose()
+    if replica is None:
+        return SessionLocal()
+    return replica.session_factory()
+
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
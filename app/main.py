@@ -1,7 +1,16 @@
-from fastapi import FastAPI
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.api.middleware import IDEMPOTENT_REPLAYED_HEADER, IdempotencyMiddleware
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.db import session as db_session
+from app.db.session import SessionLocal
+from app.services import idempotency, partitions, reservations, rollup, sketch_store
+from app.services.scheduler import scheduler
 from fastapi.openapi.models import SecurityScheme
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.openapi.utils import get_openapi
@@ -51,6 +60,9 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+# Replay write requests retried with an Idempotency-Key; added first so CORS wraps it
+app.add_middleware(IdempotencyMiddleware)
+
 # Set up CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,12 +70,66 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAYED_HEADER],
 )
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.exception_handler(OperationalError)
+async def statement_timeout_handler(request: Request, exc: OperationalError):
+    # A statement that ran past its query budget is a transient overload, not a server bug
+    if exc.orig is None or not exc.orig.args or exc.orig.args[0] != db_session.MAX_EXECUTION_TIME_EXCEEDED:
+        raise exc
+    db_session.query_timeouts[request.url.path] += 1
+    logging.getLogger(__name__).warning("Query budget exceeded on %s", request.url.path)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The query took too long, please retry later or narrow the request"},
+        headers={"Retry-After": str(settings.QUERY_TIMEOUT_RETRY_AFTER_SECONDS)}
+    )
+
+
+@app.on_event("startup")
+def start_replica_health_checks():
+    # Every worker probes its own replica pool, so this is not a scheduler job
+    db_session.replicas.start()
+
+
+@app.on_event("shutdown")
+def stop_replica_health_checks():
+    db_session.replicas.stop()
+
+
+@app.on_event("startup")
+def start_scheduler():
+    if settings.SCHEDULER_ENABLED:
+        scheduler.register("fold_period_rollups", rollup.fold_period_rollups)
+        scheduler.register(
+            "ensure_partitions",
+            lambda db: partitions.ensure_all_partitions(db, settings.PARTITION_MONTHS_AHEAD)
+        )
+        scheduler.register("purge_idempotency_keys", idempotency.purge_expired)
+        scheduler.register("expire_reservations", reservations.expire_reservations)
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.stop()
+
+
+@app.on_event("shutdown")
+def flush_analytics_sketches():
+    # Persist sketch updates that are still buffered in this worker
+    db = SessionLocal()
+    try:
+        sketch_store.store.flush(db)
+    finally:
+        db.close()
+
+
 @app.get("/", tags=["public"])
 def root():
     return {"message": "Welcome to E-commerce Admin API. Visit /api/v1/docs for API documentation."} 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, Boolean, Enum, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -42,7 +42,7 @@ class Customer(Base):
     billing_addresses = relationship("Address", foreign_keys=[default_billing_address_id])
     orders = relationship("Order", back_populates="customer")
     reviews = relationship("Review", back_populates="customer")
-    sales = relationship("Sale", back_populates="customer")
+    sales = relationship("Sale", primaryjoin="Customer.id == foreign(Sale.customer_id)", back_populates="customer")
 
 
 class Address(Base):
@@ -58,6 +58,14 @@ class Address(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class PaymentStatus(str, enum.Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    REFUNDED = "refunded"
+    PARTIAL = "partial"  # Orders only: paid in part
+
+
 class OrderStatus(str, enum.Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -81,6 +89,12 @@ class Order(Base):
     total = Column(Float, nullable=False)
     tracking_number = Column(String(100))
     notes = Column(Text)
+    # Sum of completed payments and the status derived from it, kept up to date by
+    # app/services/order_payments.py whenever payments or the total change
+    amount_paid = Column(Float, nullable=False, default=0, server_default="0")
+    payment_status = Column(
+        Enum(PaymentStatus), nullable=False, default=PaymentStatus.PENDING, server_default=PaymentStatus.PENDING.name
+    )
 
     # Relationships
     customer = relationship("Customer", back_populates="orders")
@@ -88,12 +102,14 @@ class Order(Base):
     billing_address = relationship("Address", foreign_keys=[billing_address_id])
     order_items = relationship("OrderItem", back_populates="order")
     payments = relationship("Payment", back_populates="order")
-    sales = relationship("Sale", back_populates="order")
+    sales = relationship("Sale", primaryjoin="Order.id == foreign(Sale.order_id)", back_populates="order")
 
     # Indexes
     __table_args__ = (
         Index("idx_order_customer", "customer_id", "order_date"),
         Index("idx_order_status", "status", "order_date"),
+        Index("idx_order_date", "order_date"),
+        Index("idx_order_payment_status", "payment_status", "order_date"),
     )
 
 
@@ -111,13 +127,6 @@ class OrderItem(Base):
     product = relationship("Product", back_populates="order_items")
 
 
-class PaymentStatus(str, enum.Enum):
-    PENDING = "pending"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    REFUNDED = "refunded"
-
-
 class Payment(Base):
     __tablename__ = "payment"
     id = Column(Integer, primary_key=True, index=True)
@@ -157,7 +166,7 @@ class Product(Base):
     inventory = relationship("Inventory", back_populates="product", uselist=False)
     order_items = relationship("OrderItem", back_populates="product")
     reviews = relationship("Review", back_populates="product")
-    sales = relationship("Sale", back_populates="product")
+    sales = relationship("Sale", primaryjoin="Product.id == foreign(Sale.product_id)", back_populates="product")
 
 
 class Category(Base):
@@ -174,25 +183,109 @@ class Category(Base):
 
 class Sale(Base):
     __tablename__ = "sale"
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("product.id"), nullable=False)
-    order_id = Column(Integer, ForeignKey("order.id"), nullable=False)
-    customer_id = Column(Integer, ForeignKey("customer.id"), nullable=False)
+    # Partitioned by month on sale_date, so the date is part of the primary key and
+    # MySQL allows no foreign keys; references are only declared on the relationships
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    product_id = Column(Integer, nullable=False)
+    order_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer, nullable=False)
+    # Product category at the time of the sale; not rewritten when the product moves
+    category_id = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
     total_amount = Column(Float, nullable=False)
-    sale_date = Column(DateTime(timezone=True), server_default=func.now())
+    # Part of the primary key and stored in whole seconds, so set it without microseconds
+    sale_date = Column(DateTime(timezone=True), primary_key=True, default=func.now(), server_default=func.now())
 
     # Relationships
-    product = relationship("Product", back_populates="sales")
-    order = relationship("Order", back_populates="sales")
-    customer = relationship("Customer", back_populates="sales")
+    product = relationship("Product", primaryjoin="Product.id == foreign(Sale.product_id)", back_populates="sales")
+    order = relationship("Order", primaryjoin="Order.id == foreign(Sale.order_id)", back_populates="sales")
+    customer = relationship("Customer", primaryjoin="Customer.id == foreign(Sale.customer_id)", back_populates="sales")
 
     # Indexes
     __table_args__ = (
         Index("idx_sale_product", "product_id", "sale_date"),
         Index("idx_sale_customer", "customer_id", "sale_date"),
         Index("idx_sale_order", "order_id", "sale_date"),
+        Index("idx_sale_date", "sale_date"),
+        Index("idx_sale_category", "category_id", "sale_date"),
+    )
+
+
+class SaleDailyRollup(Base):
+    __tablename__ = "sale_daily_rollup"
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("product.id"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("category.id"), primary_key=True)
+    total_revenue = Column(Float, nullable=False, default=0)
+    total_sales = Column(Integer, nullable=False, default=0)
+    total_quantity = Column(Integer, nullable=False, default=0)
+
+    # Indexes
+    __table_args__ = (
+        Index("idx_sale_daily_rollup_category", "category_id", "day"),
+    )
+
+
+class SaleDailySketch(Base):
+    __tablename__ = "sale_daily_sketch"
+    day = Column(Date, primary_key=True)
+    kind = Column(String(32), primary_key=True)  # e.g. "top_products", "top_customers"
+    payload = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SalePeriodRollup(Base):
+    __tablename__ = "sale_period_rollup"
+    period_type = Column(String(10), primary_key=True)  # "weekly", "monthly" or "annual"
+    period_start = Column(Date, primary_key=True)
+    total_revenue = Column(Float, nullable=False, default=0)
+    total_sales = Column(Integer, nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermark"
+    name = Column(String(50), primary_key=True)
+    last_day = Column(Date, nullable=False)  # Last day folded into the rollup
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SchedulerLock(Base):
+    __tablename__ = "scheduler_lock"
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+    # sha256 of the method, path, credentials and client key
+    key_hash = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # Random per claim, so only the request holding the key can renew, store or release it
+    claim_token = Column(String(32))
+    # NULL while the first request is in flight
+    status_code = Column(Integer)
+    content_type = Column(String(100))
+    response_body = Column(LargeBinary(16777215))
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    # End of the in-flight lease, then of the retention of the stored response
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class InventoryReservation(Base):
+    __tablename__ = "inventory_reservation"
+    # Stock held for an open order; counted in inventory.reserved
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("order.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("product.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # Indexes
+    __table_args__ = (
+        Index("idx_inventory_reservation_order_product", "order_id", "product_id", unique=True),
     )
 
 
@@ -201,24 +294,28 @@ class Inventory(Base):
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("product.id"), unique=True, nullable=False)
     quantity = Column(Integer, nullable=False, default=0)
+    # Sum of the open reservations; available stock is quantity - reserved
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")
     low_stock_threshold = Column(Integer, nullable=False, default=10)
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     product = relationship("Product", back_populates="inventory")
-    history = relationship("InventoryHistory", back_populates="inventory")
+    history = relationship("InventoryHistory", primaryjoin="Inventory.id == foreign(InventoryHistory.inventory_id)", back_populates="inventory")
 
 
 class InventoryHistory(Base):
     __tablename__ = "inventory_history"
-    id = Column(Integer, primary_key=True, index=True)
-    inventory_id = Column(Integer, ForeignKey("inventory.id"), nullable=False)
+    # Partitioned by month on timestamp, like sale
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    inventory_id = Column(Integer, nullable=False)
     quantity_change = Column(Integer, nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Part of the primary key and stored in whole seconds, so set it without microseconds
+    timestamp = Column(DateTime(timezone=True), primary_key=True, default=func.now(), server_default=func.now())
     reason = Column(String(255))  # e.g., "sale", "restock", "adjustment"
 
     # Relationships
-    inventory = relationship("Inventory", back_populates="history")
+    inventory = relationship("Inventory", primaryjoin="Inventory.id == foreign(InventoryHistory.inventory_id)", back_populates="history")
 
     # Indexes
     __table_args__ = (
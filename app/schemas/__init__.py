@@ -25,5 +25,10 @@ from .inventory import (
 )
 from .sale import (
     Sale, SaleCreate, SaleUpdate,
-    RevenueAnalytics, CategoryRevenue, RevenuePeriodComparison
+    SaleBulkCreate, SaleBulkLineResult, SaleBulkResult,
+    RevenueAnalytics, CategoryRevenue, RevenuePeriodComparison,
+    RevenueSeries, RevenueSeriesPoint, AnalyticsCacheStats,
+    TopItem, TopItemsResponse,
+    PercentileValue, OrderValuePercentiles,
+    ScheduledJobStats, RollupStatus, QueryBudgetStats
 ) 
\ No newline at end of file
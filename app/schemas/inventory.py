@@ -20,6 +20,7 @@ class InventoryUpdate(BaseModel):
 
 class InventoryInDB(InventoryBase):
     id: int
+    reserved: int
     last_updated: datetime
 
     class Config:
@@ -30,6 +31,11 @@ class Inventory(InventoryInDB):
     pass
 
 
+class InventoryAvailability(BaseModel):
+    product_id: int
+    available: int
+
+
 class InventoryHistoryBase(BaseModel):
     inventory_id: int
     quantity_change: int
@@ -84,6 +84,7 @@ class OrderUpdate(BaseSchema):
 class Order(OrderBase, TimestampSchema):
     id: int
     order_date: datetime
+    amount_paid: condecimal(max_digits=10, decimal_places=2) = 0
     items: List[OrderItem] = []
     payments: List[Payment] = []
 
@@ -94,8 +95,43 @@ class OrderResponse(Order):
     payment_status: PaymentStatus
 
 
+# Orders in list responses carry amount_paid and payment_status, not the payments
+class OrderListItem(OrderBase, TimestampSchema):
+    id: int
+    order_date: datetime
+    amount_paid: condecimal(max_digits=10, decimal_places=2) = 0
+    items: List[OrderItem] = []
+    total_items: int
+    payment_status: PaymentStatus
+
+
+class OrderStatusChange(BaseSchema):
+    order_id: int
+    status: OrderStatus
+    tracking_number: Optional[str] = None
+
+
+class OrderStatusBatch(BaseSchema):
+    orders: List[OrderStatusChange]
+
+
+class OrderStatusChangeResult(BaseSchema):
+    index: int  # Position of the line in the request
+    order_id: int
+    status: str  # "updated" or "rejected"
+    error: Optional[str] = None
+
+
+class OrderStatusBatchResult(BaseSchema):
+    updated: int
+    rejected: int
+    results: List[OrderStatusChangeResult]
+
+
 class OrderListResponse(BaseSchema):
-    total: int
+    total: Optional[int] = None  # None when the count was skipped with total=false
+    total_is_estimate: bool = False
     page: int
     size: int
-    orders: List[OrderResponse] 
\ No newline at end of file
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
+    orders: List[OrderListItem] 
\ No newline at end of file
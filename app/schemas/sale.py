@@ -1,5 +1,5 @@
-from typing import Optional
-from datetime import datetime
+from typing import Dict, Optional, List
+from datetime import date, datetime
 from pydantic import condecimal
 from .base import BaseSchema, TimestampSchema
 from .customer import Customer
@@ -19,6 +19,23 @@ class SaleCreate(SaleBase):
     pass
 
 
+class SaleBulkCreate(BaseSchema):
+    sales: List[SaleCreate]
+
+
+class SaleBulkLineResult(BaseSchema):
+    index: int  # Position of the line in the request
+    status: str  # "created" or "rejected"
+    error: Optional[str] = None
+
+
+class SaleBulkResult(BaseSchema):
+    created: int
+    rejected: int
+    sale_date: datetime
+    results: List[SaleBulkLineResult]
+
+
 class SaleUpdate(SaleBase):
     product_id: Optional[int] = None
     order_id: Optional[int] = None
@@ -30,6 +47,7 @@ class SaleUpdate(SaleBase):
 
 class Sale(SaleBase, TimestampSchema):
     id: int
+    category_id: Optional[int] = None
     sale_date: datetime
     order: Optional[Order] = None
     customer: Optional[Customer] = None
@@ -43,6 +61,7 @@ class RevenueAnalytics(BaseSchema):
     total_revenue: condecimal(max_digits=10, decimal_places=2)
     total_sales: int
     average_order_value: condecimal(max_digits=10, decimal_places=2)
+    unique_customers: Optional[int] = None
 
 
 class CategoryRevenue(BaseSchema):
@@ -57,4 +76,82 @@ class RevenuePeriodComparison(BaseSchema):
     period_1: RevenueAnalytics
     period_2: RevenueAnalytics
     revenue_change_percentage: float
-    sales_change_percentage: float 
\ No newline at end of file
+    sales_change_percentage: float
+    previous_periods: List[RevenueAnalytics] = []
+
+
+class RevenueSeriesPoint(BaseSchema):
+    bucket_start: datetime
+    total_revenue: condecimal(max_digits=10, decimal_places=2)
+    total_sales: int
+
+
+class RevenueSeries(BaseSchema):
+    granularity: str
+    start_date: datetime
+    end_date: datetime
+    points: List[RevenueSeriesPoint]
+
+
+class AnalyticsCacheStats(BaseSchema):
+    size: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class TopItem(BaseSchema):
+    id: int
+    total_revenue: float
+    max_error: float = 0
+
+
+class TopItemsResponse(BaseSchema):
+    start_date: datetime
+    end_date: datetime
+    exact: bool
+    items: List[TopItem]
+
+
+class PercentileValue(BaseSchema):
+    percentile: float
+    value: float
+
+
+class OrderValuePercentiles(BaseSchema):
+    start_date: datetime
+    end_date: datetime
+    total_orders: int
+    percentiles: List[PercentileValue]
+
+
+class ScheduledJobStats(BaseSchema):
+    name: str
+    runs: int
+    failures: int
+    last_started_at: Optional[datetime] = None
+    last_succeeded_at: Optional[datetime] = None
+    last_duration_seconds: Optional[float] = None
+    last_result: Optional[str] = None
+    last_error: Optional[str] = None
+
+
+class RollupStatus(BaseSchema):
+    watermark: Optional[date] = None  # Last day folded into the period rollups
+    lag_days: Optional[int] = None  # Closed days not folded yet
+    owner: str
+    running: bool
+    is_leader: bool
+    interval_seconds: float
+    jobs: List[ScheduledJobStats] = []
+
+
+class QueryBudgetStats(BaseSchema):
+    analytics_ms: int
+    list_ms: int
+    crud_ms: int
+    timeouts: Dict[str, int] = {}  # Statements interrupted by their budget, per path
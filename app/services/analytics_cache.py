@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import Sale as SaleModel
+
+# Key under which a session collects the dates of sales it has flushed
+PENDING_SALE_DATES_KEY = "analytics_cache_sale_dates"
+
+
+class _Entry:
+    __slots__ = ("value", "window_start", "window_end", "expires_at")
+
+    def __init__(self, value: Any, window_start: datetime, window_end: datetime, expires_at: Optional[float]):
+        self.value = value
+        self.window_start = window_start
+        self.window_end = window_end
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """LRU result cache for analytics aggregates.
+
+    Every entry remembers the sale_date window it was computed over. Entries
+    for windows still open (ending in the future) expire after ``ttl_seconds``;
+    entries for closed historical windows never expire and are only dropped by
+    LRU eviction or by a sale being written inside their window.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def set(self, key: Hashable, value: Any, window_start: datetime, window_end: datetime) -> None:
+        expires_at = None
+        if window_end > datetime.now():
+            expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = _Entry(value, window_start, window_end, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        window_start: datetime,
+        window_end: datetime,
+        compute: Callable[[], Any]
+    ) -> Any:
+        if self.max_entries <= 0:
+            return compute()
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.set(key, value, window_start, window_end)
+        return value
+
+    def invalidate_dates(self, sale_dates: Iterable[datetime]) -> int:
+        """Drop every entry whose window contains one of the given sale dates."""
+        sale_dates = list(sale_dates)
+        if not sale_dates:
+            return 0
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if any(entry.window_start <= d <= entry.window_end for d in sale_dates)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = ResultCache(
+    max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS
+)
+
+
+def note_sale_dates(session: Session, sale_dates: Iterable[Optional[datetime]]) -> None:
+    """Record sale dates written by a session; the cache is invalidated on commit.
+
+    Use this for sales inserted with Core statements, which the flush hook
+    below cannot see.
+    """
+    pending = session.info.setdefault(PENDING_SALE_DATES_KEY, [])
+    pending.extend(d or datetime.now() for d in sale_dates)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_sale_dates(session: Session, flush_context) -> None:
+    dates = [obj.sale_date for obj in session.new if isinstance(obj, SaleModel)]
+    if dates:
+        note_sale_dates(session, dates)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_SALE_DATES_KEY, None)
+    if pending:
+        cache.invalidate_dates(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(PENDING_SALE_DATES_KEY, None)
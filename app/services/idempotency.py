@@ -0,0 +1,126 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import IdempotencyKey as IdempotencyKeyModel
+
+# Expired keys removed per DELETE by the purge job
+PURGE_BATCH_SIZE = 1000
+
+
+def key_hash(method: str, path: str, credentials: str, key: str) -> str:
+    """Scope a client key to the endpoint and caller so different users cannot collide."""
+    return hashlib.sha256("\n".join([method, path, credentials, key]).encode("utf-8")).hexdigest()
+
+
+def request_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def new_claim_token() -> str:
+    return uuid.uuid4().hex
+
+
+def claim(db: Session, key: str, fingerprint: str, token: str) -> Optional[IdempotencyKeyModel]:
+    """Take the key for a new request, marking the claim with token.
+
+    Returns None only when the caller now holds the key (a row carries
+    token) and should run the request, otherwise the existing record: a
+    stored response, or a request still in flight. A record whose lease or
+    retention ran out is taken over. If the holder releases the key between
+    the attempt and the read, the claim is tried again.
+    """
+    while True:
+        now = datetime.now()
+        lease = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        inserted = db.execute(
+            mysql_insert(IdempotencyKeyModel).prefix_with("IGNORE").values(
+                key_hash=key, request_hash=fingerprint, claim_token=token, created_at=now, expires_at=lease
+            )
+        )
+        if inserted.rowcount == 0:
+            # A request that died holding the key, or a response past its retention
+            inserted = db.execute(
+                update(IdempotencyKeyModel).where(
+                    IdempotencyKeyModel.key_hash == key,
+                    IdempotencyKeyModel.expires_at < now
+                ).values(
+                    request_hash=fingerprint,
+                    claim_token=token,
+                    status_code=None,
+                    content_type=None,
+                    response_body=None,
+                    created_at=now,
+                    expires_at=lease
+                ).execution_options(synchronize_session=False)
+            )
+        db.commit()
+        if inserted.rowcount:
+            return None
+        existing = db.query(IdempotencyKeyModel).filter(IdempotencyKeyModel.key_hash == key).first()
+        if existing is not None:
+            return existing
+
+
+def renew(db: Session, key: str, token: str) -> bool:
+    """Extend the lease of a claim still in flight; False if the claim was lost."""
+    result = db.execute(
+        update(IdempotencyKeyModel).where(
+            IdempotencyKeyModel.key_hash == key,
+            IdempotencyKeyModel.claim_token == token,
+            IdempotencyKeyModel.status_code.is_(None)
+        ).values(
+            expires_at=datetime.now() + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def complete(db: Session, key: str, token: str, status_code: int, content_type: Optional[str], body: bytes) -> None:
+    """Store the response of the request holding the claim so retries get it back."""
+    db.execute(
+        update(IdempotencyKeyModel).where(
+            IdempotencyKeyModel.key_hash == key,
+            IdempotencyKeyModel.claim_token == token,
+            IdempotencyKeyModel.status_code.is_(None)
+        ).values(
+            status_code=status_code,
+            content_type=content_type,
+            response_body=body,
+            expires_at=datetime.now() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def release(db: Session, key: str, token: str) -> None:
+    """Give up an in-flight claim so the request can be retried with the key."""
+    db.execute(
+        delete(IdempotencyKeyModel).where(
+            IdempotencyKeyModel.key_hash == key,
+            IdempotencyKeyModel.claim_token == token,
+            IdempotencyKeyModel.status_code.is_(None)
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def purge_expired(db: Session) -> int:
+    """Delete expired keys in small batches; a scheduler job. Returns the number deleted."""
+    now = datetime.now()
+    purged = 0
+    while True:
+        result = db.execute(
+            delete(IdempotencyKeyModel).where(
+                IdempotencyKeyModel.expires_at < now
+            ).with_dialect_options(mysql_limit=PURGE_BATCH_SIZE).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        purged += result.rowcount
+        if result.rowcount < PURGE_BATCH_SIZE:
+            return purged
@@ -0,0 +1,87 @@
+from typing import Iterable, Set
+from sqlalchemy import and_, case, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from app.models import (
+    Order as OrderModel,
+    Payment as PaymentModel,
+    PaymentStatus
+)
+
+# Key under which a session collects the orders whose payments it has flushed
+PENDING_ORDER_IDS_KEY = "order_payments_order_ids"
+
+
+def payment_status_for(amount_paid: float, total: float) -> PaymentStatus:
+    """Payment status of an order from its completed payments and total."""
+    if amount_paid > 0 and amount_paid >= total:
+        return PaymentStatus.COMPLETED
+    if amount_paid > 0:
+        return PaymentStatus.PARTIAL
+    return PaymentStatus.PENDING
+
+
+def payment_status_case(amount_paid, total):
+    """payment_status_for as a SQL expression, for UPDATEs that change either column."""
+    return case(
+        (and_(amount_paid > 0, amount_paid >= total), PaymentStatus.COMPLETED.name),
+        (amount_paid > 0, PaymentStatus.PARTIAL.name),
+        else_=PaymentStatus.PENDING.name
+    )
+
+
+def refresh_payment_totals(db: Session, order_ids: Iterable[int]) -> int:
+    """Recompute amount_paid and payment_status of orders from their payments.
+
+    Called automatically for payments written through the ORM; Core
+    statements that write payments have to call it themselves. Returns the
+    number of orders updated.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    paid = select(
+        func.coalesce(func.sum(PaymentModel.amount), 0)
+    ).where(
+        PaymentModel.order_id == OrderModel.id,
+        PaymentModel.status == PaymentStatus.COMPLETED
+    ).scalar_subquery()
+    # MySQL assigns left to right, so the status sees the new amount
+    result = db.connection().execute(
+        update(OrderModel).where(
+            OrderModel.id.in_(order_ids)
+        ).ordered_values(
+            (OrderModel.amount_paid, paid),
+            (OrderModel.payment_status, payment_status_case(OrderModel.amount_paid, OrderModel.total))
+        )
+    )
+    return result.rowcount
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_order_ids(session: Session, flush_context) -> None:
+    order_ids: Set[int] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, PaymentModel):
+            order_ids.add(obj.order_id)
+            # A payment moved to another order changes the old one too
+            order_ids.update(inspect(obj).attrs.order_id.history.deleted or ())
+    order_ids.discard(None)
+    if order_ids:
+        session.info.setdefault(PENDING_ORDER_IDS_KEY, set()).update(order_ids)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refresh_after_flush(session: Session, flush_context) -> None:
+    order_ids = session.info.pop(PENDING_ORDER_IDS_KEY, None)
+    if not order_ids:
+        return
+    refresh_payment_totals(session, order_ids)
+    # Orders already loaded in the session would otherwise keep the old values
+    for obj in session.identity_map.values():
+        if isinstance(obj, OrderModel) and obj.id in order_ids:
+            session.expire(obj, ["amount_paid", "payment_status"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(PENDING_ORDER_IDS_KEY, None)
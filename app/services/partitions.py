@@ -0,0 +1,152 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Append-only tables partitioned by month (RANGE COLUMNS), with their partitioning column
+PARTITIONED_TABLES = {
+    "sale": "sale_date",
+    "inventory_history": "timestamp",
+}
+
+# Partition catching rows past the last monthly one
+CATCH_ALL = "pmax"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def archive_table_name(table: str, partition: str) -> str:
+    return f"{table}_archive_{partition}"
+
+
+def _check_table(table: str) -> None:
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"{table} is not a partitioned table")
+
+
+def _upper_bound(description: Optional[str]) -> Optional[date]:
+    # PARTITION_DESCRIPTION is the quoted LESS THAN value, or MAXVALUE for the catch-all
+    if description is None or description.upper() == "MAXVALUE":
+        return None
+    return date.fromisoformat(description.strip("'")[:10])
+
+
+def list_partitions(db: Session, table: str) -> List[Dict[str, Any]]:
+    """Partitions of table in order with their [lower, upper) month bounds and estimated rows.
+
+    Empty for a table that is not partitioned (e.g. one created with create_all).
+    """
+    _check_table(table)
+    rows = db.execute(
+        text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS "
+            "FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": table}
+    ).all()
+
+    partitions = []
+    lower = None
+    for name, description, estimated_rows in rows:
+        upper = _upper_bound(description)
+        partitions.append({"name": name, "lower": lower, "upper": upper, "rows": estimated_rows})
+        lower = upper
+    return partitions
+
+
+def ensure_partitions(db: Session, table: str, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Split monthly partitions off the catch-all until months_ahead past the current month exist.
+
+    The catch-all is normally empty, so the reorganization only rewrites
+    metadata. Returns the names of the partitions created.
+    """
+    partitions = list_partitions(db, table)
+    if not partitions:
+        return []
+    bounds = [partition["upper"] for partition in partitions if partition["upper"] is not None]
+    month = max(bounds) if bounds else (today or date.today()).replace(day=1)
+    last = add_months((today or date.today()).replace(day=1), months_ahead)
+
+    created = []
+    definitions = []
+    while month <= last:
+        created.append(partition_name(month))
+        definitions.append(f"PARTITION {created[-1]} VALUES LESS THAN ('{add_months(month, 1).isoformat()}')")
+        month = add_months(month, 1)
+    if not created:
+        return []
+
+    definitions.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN (MAXVALUE)")
+    db.execute(text(f"ALTER TABLE `{table}` REORGANIZE PARTITION {CATCH_ALL} INTO ({', '.join(definitions)})"))
+    return created
+
+
+def ensure_all_partitions(db: Session, months_ahead: int) -> Dict[str, List[str]]:
+    """Run ensure_partitions for every partitioned table; a scheduler job."""
+    return {table: ensure_partitions(db, table, months_ahead) for table in PARTITIONED_TABLES}
+
+
+def archive_partitions(db: Session, table: str, before: date) -> List[str]:
+    """Move the monthly partitions entirely before the month of before into archive tables.
+
+    Each partition is swapped with an empty table of the same structure
+    (<table>_archive_pYYYYMM) with EXCHANGE PARTITION, which moves no rows, and
+    then dropped. A partition left empty by an interrupted run is just dropped.
+    Returns the names of the archive tables written.
+    """
+    cutoff = before.replace(day=1)
+    archived = []
+    for partition in list_partitions(db, table):
+        if partition["upper"] is None or partition["upper"] > cutoff:
+            continue
+        name = partition["name"]
+        archive = archive_table_name(table, name)
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS `{archive}` LIKE `{table}`"))
+        if db.execute(text(
+            "SELECT CREATE_OPTIONS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {"table": archive}).scalar() == "partitioned":
+            db.execute(text(f"ALTER TABLE `{archive}` REMOVE PARTITIONING"))
+
+        partition_rows = db.execute(text(f"SELECT COUNT(*) FROM `{table}` PARTITION ({name})")).scalar()
+        archive_rows = db.execute(text(f"SELECT COUNT(*) FROM `{archive}`")).scalar()
+        if partition_rows and archive_rows:
+            raise RuntimeError(f"{archive} already holds rows, not exchanging {table} partition {name} into it")
+        if partition_rows:
+            db.execute(text(f"ALTER TABLE `{table}` EXCHANGE PARTITION {name} WITH TABLE `{archive}`"))
+        db.execute(text(f"ALTER TABLE `{table}` DROP PARTITION {name}"))
+        archived.append(archive)
+    return archived
+
+
+def explain_partitions(db: Session, statement) -> List[str]:
+    """The partitions MySQL reads for a select() statement, according to EXPLAIN."""
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    result = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", params)
+    read = set()
+    for row in result.mappings():
+        if row.get("partitions"):
+            read.update(row["partitions"].split(","))
+    return sorted(read)
+
+
+def overlapping_partitions(db: Session, table: str, start: datetime, end: datetime) -> List[str]:
+    """The partitions of table holding rows in [start, end], i.e. what pruning should leave."""
+    return [
+        partition["name"]
+        for partition in list_partitions(db, table)
+        if (partition["lower"] is None or end.date() >= partition["lower"])
+        and (partition["upper"] is None or start.date() < partition["upper"])
+    ]
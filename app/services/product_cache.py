@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import Product as ProductModel
+
+# Key under which a session collects the ids of products it has changed
+PENDING_PRODUCT_IDS_KEY = "product_cache_product_ids"
+
+
+class CachedProduct:
+    __slots__ = ("price", "category_id", "expires_at")
+
+    def __init__(self, price: float, category_id: int, expires_at: float):
+        self.price = price
+        self.category_id = category_id
+        self.expires_at = expires_at
+
+
+class ProductCache:
+    """Process-local LRU cache of product prices and categories for order pricing.
+
+    Products changed through a session are dropped when it commits, and every
+    invalidation bumps a version so a lookup that read the database before the
+    change cannot store the old price afterwards. Changes made by other
+    workers are picked up once entries expire after ``ttl_seconds``.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, CachedProduct]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, db: Session, product_ids: Iterable[int]) -> Dict[int, CachedProduct]:
+        """Look up products by id, loading the missing ones with a single IN query.
+
+        Unknown ids are left out of the result.
+        """
+        wanted = set(product_ids)
+        found: Dict[int, CachedProduct] = {}
+        now = time.monotonic()
+        with self._lock:
+            for product_id in wanted:
+                entry = self._entries.get(product_id)
+                if entry is not None and entry.expires_at > now:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+            version = self.version
+
+        missing = wanted - found.keys()
+        if not missing:
+            return found
+        rows = db.query(
+            ProductModel.id, ProductModel.price, ProductModel.category_id
+        ).filter(ProductModel.id.in_(list(missing))).all()
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        loaded = {row.id: CachedProduct(row.price, row.category_id, expires_at) for row in rows}
+        found.update(loaded)
+        if self.max_entries > 0:
+            with self._lock:
+                # Skip storing if a product changed while we were reading
+                if self.version == version:
+                    self._entries.update(loaded)
+                    for product_id in loaded:
+                        self._entries.move_to_end(product_id)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return found
+
+    def invalidate(self, product_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.version += 1
+            for product_id in product_ids:
+                if self._entries.pop(product_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = ProductCache(
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_product_ids(session: Session, flush_context) -> None:
+    changed = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, ProductModel)
+    ]
+    if changed:
+        session.info.setdefault(PENDING_PRODUCT_IDS_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_PRODUCT_IDS_KEY, None)
+    if pending:
+        cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(PENDING_PRODUCT_IDS_KEY, None)
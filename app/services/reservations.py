@@ -0,0 +1,225 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import case, delete, func, insert, tuple_, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import (
+    Inventory as InventoryModel,
+    InventoryReservation as InventoryReservationModel
+)
+
+# Expired reservations released per transaction by the expiry job
+EXPIRE_BATCH_SIZE = 1000
+
+# Every path that changes an order's stock, reservations or items locks the
+# order row first, then inventory rows (in product order), then reservation
+# rows, so the order and sale endpoints cannot deadlock with each other. The
+# expiry job locks no order and starts at inventory.
+
+
+def adjust(db: Session, order_id: int, changes: Dict[int, int]) -> List[int]:
+    """Change an order's reservations by {product_id: quantity change}.
+
+    Positive changes reserve more stock; negative ones give it back, never
+    more than the order holds. The inventory rows are locked and checked
+    first, so either every change is made or nothing is written. Returns the
+    ids of the products without enough available stock (or without
+    inventory) for an increase; empty on success. The caller is responsible
+    for committing.
+    """
+    changes = {product_id: change for product_id, change in changes.items() if change}
+    if not changes:
+        return []
+    available = dict(
+        db.query(
+            InventoryModel.product_id, InventoryModel.quantity - InventoryModel.reserved
+        ).filter(
+            InventoryModel.product_id.in_(list(changes))
+        ).order_by(InventoryModel.product_id).with_for_update().all()
+    )
+    short = sorted(
+        product_id for product_id, change in changes.items()
+        if change > 0 and available.get(product_id, 0) < change
+    )
+    if short:
+        return short
+
+    held = lock_reservations(db, [(order_id, product_id) for product_id in changes])
+    # Releases are capped at what the order holds
+    changes = {
+        product_id: max(change, -held.get((order_id, product_id), (None, 0))[1])
+        for product_id, change in changes.items()
+    }
+    changes = {product_id: change for product_id, change in changes.items() if change}
+    if not changes:
+        return []
+
+    db.execute(
+        update(InventoryModel).where(
+            InventoryModel.product_id.in_(list(changes))
+        ).values(
+            reserved=InventoryModel.reserved + case(changes, value=InventoryModel.product_id)
+        ).execution_options(synchronize_session=False)
+    )
+    updated = {
+        held[(order_id, product_id)][0]: change
+        for product_id, change in changes.items() if (order_id, product_id) in held
+    }
+    if updated:
+        db.execute(
+            update(InventoryReservationModel).where(
+                InventoryReservationModel.id.in_(list(updated))
+            ).values(
+                quantity=InventoryReservationModel.quantity + case(updated, value=InventoryReservationModel.id)
+            ).execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(InventoryReservationModel).where(
+                InventoryReservationModel.id.in_(list(updated)),
+                InventoryReservationModel.quantity <= 0
+            ).execution_options(synchronize_session=False)
+        )
+    expires_at = datetime.now() + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+    created = [
+        {"order_id": order_id, "product_id": product_id, "quantity": change, "expires_at": expires_at}
+        for product_id, change in changes.items() if (order_id, product_id) not in held
+    ]
+    if created:
+        db.execute(insert(InventoryReservationModel), created)
+    return []
+
+
+def _release(db: Session, *criteria) -> int:
+    """Release the reservations matching criteria; returns the number released."""
+    product_ids = [
+        product_id for product_id, in db.query(
+            InventoryReservationModel.product_id
+        ).filter(*criteria).distinct()
+    ]
+    if not product_ids:
+        return 0
+    db.query(InventoryModel.id).filter(
+        InventoryModel.product_id.in_(product_ids)
+    ).order_by(InventoryModel.product_id).with_for_update().all()
+    # Read again under the lock; a sale may have consumed some in between
+    rows = db.query(
+        InventoryReservationModel.id, InventoryReservationModel.product_id, InventoryReservationModel.quantity
+    ).filter(
+        *criteria, InventoryReservationModel.product_id.in_(product_ids)
+    ).with_for_update().all()
+    if not rows:
+        return 0
+
+    released: Dict[int, int] = defaultdict(int)
+    for row in rows:
+        released[row.product_id] += row.quantity
+    db.execute(
+        update(InventoryModel).where(
+            InventoryModel.product_id.in_(list(released))
+        ).values(
+            reserved=func.greatest(InventoryModel.reserved - case(released, value=InventoryModel.product_id), 0)
+        ).execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(InventoryReservationModel).where(
+            InventoryReservationModel.id.in_([row.id for row in rows])
+        ).execution_options(synchronize_session=False)
+    )
+    return len(rows)
+
+
+def release_orders(db: Session, order_ids: Iterable[int]) -> int:
+    """Give back the stock reserved by orders, e.g. when they are cancelled.
+
+    The caller is responsible for committing. Returns the number of
+    reservations released.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    return _release(db, InventoryReservationModel.order_id.in_(order_ids))
+
+
+def expire_reservations(db: Session) -> int:
+    """Release reservations past their expiry in batches; a scheduler job. Returns the number released."""
+    now = datetime.now()
+    expired = 0
+    while True:
+        ids = [
+            reservation_id for reservation_id, in db.query(
+                InventoryReservationModel.id
+            ).filter(
+                InventoryReservationModel.expires_at < now
+            ).order_by(InventoryReservationModel.id).limit(EXPIRE_BATCH_SIZE)
+        ]
+        if not ids:
+            return expired
+        expired += _release(
+            db,
+            InventoryReservationModel.id.in_(ids),
+            InventoryReservationModel.expires_at < now
+        )
+        db.commit()
+        if len(ids) < EXPIRE_BATCH_SIZE:
+            return expired
+
+
+def lock_reservations(db: Session, pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """Lock the reservations of (order_id, product_id) pairs.
+
+    Returns {(order_id, product_id): (reservation id, quantity)} for the pairs
+    that have one. Lock the inventory rows of the products first.
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return {}
+    return {
+        (row.order_id, row.product_id): (row.id, row.quantity)
+        for row in db.query(
+            InventoryReservationModel.id, InventoryReservationModel.order_id,
+            InventoryReservationModel.product_id, InventoryReservationModel.quantity
+        ).filter(
+            tuple_(InventoryReservationModel.order_id, InventoryReservationModel.product_id).in_(pairs)
+        ).order_by(InventoryReservationModel.id).with_for_update()
+    }
+
+
+def consume(db: Session, taken: Dict[int, int]) -> None:
+    """Take quantities ({reservation id: quantity}) off locked reservations, deleting the used up ones.
+
+    The matching inventory.reserved decrement is left to the caller, which
+    updates the inventory row for the sale anyway.
+    """
+    taken = {reservation_id: quantity for reservation_id, quantity in taken.items() if quantity > 0}
+    if not taken:
+        return
+    db.execute(
+        update(InventoryReservationModel).where(
+            InventoryReservationModel.id.in_(list(taken))
+        ).values(
+            quantity=InventoryReservationModel.quantity - case(taken, value=InventoryReservationModel.id)
+        ).execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(InventoryReservationModel).where(
+            InventoryReservationModel.id.in_(list(taken)),
+            InventoryReservationModel.quantity <= 0
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def available(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Stock that can still be ordered per product, from one indexed read of inventory.
+
+    Products without inventory are left out.
+    """
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return {}
+    return dict(
+        db.query(
+            InventoryModel.product_id,
+            func.greatest(InventoryModel.quantity - InventoryModel.reserved, 0)
+        ).filter(InventoryModel.product_id.in_(product_ids)).all()
+    )
@@ -0,0 +1,474 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.models import (
+    Sale as SaleModel,
+    SaleDailyRollup as SaleDailyRollupModel,
+    SalePeriodRollup as SalePeriodRollupModel,
+    RollupWatermark as RollupWatermarkModel
+)
+
+# Periods folded from the daily rollup by the background scheduler
+PERIOD_TYPES = ("weekly", "monthly", "annual")
+PERIOD_WATERMARK = "sale_period_rollup"
+
+
+def record_sale(
+    db: Session,
+    sale_date: datetime,
+    product_id: int,
+    category_id: int,
+    total_amount: float,
+    quantity: int
+) -> None:
+    """Fold a single sale into its daily rollup row.
+
+    Runs inside the caller's transaction so the rollup commits (or rolls back)
+    together with the sale itself. Backdated sales on days that were already
+    folded into the period rollups are added to those as well.
+    """
+    record_sales(db, [(sale_date, product_id, category_id, total_amount, quantity)])
+
+
+def record_sales(
+    db: Session,
+    sales: Iterable[Tuple[datetime, int, int, float, int]]
+) -> None:
+    """Fold a batch of (sale_date, product_id, category_id, total_amount, quantity) sales.
+
+    Sales sharing a rollup row are summed first, so the whole batch is a single
+    multi-row upsert.
+    """
+    rows: Dict[Tuple[date, int, int], List] = {}
+    for sale_date, product_id, category_id, total_amount, quantity in sales:
+        row = rows.setdefault((sale_date.date(), product_id, category_id), [0.0, 0, 0])
+        row[0] += float(total_amount)
+        row[1] += 1
+        row[2] += quantity
+    if not rows:
+        return
+
+    stmt = mysql_insert(SaleDailyRollupModel).values([
+        {
+            "day": day,
+            "product_id": product_id,
+            "category_id": category_id,
+            "total_revenue": revenue,
+            "total_sales": count,
+            "total_quantity": quantity
+        }
+        for (day, product_id, category_id), (revenue, count, quantity) in rows.items()
+    ])
+    stmt = stmt.on_duplicate_key_update(
+        total_revenue=SaleDailyRollupModel.total_revenue + stmt.inserted.total_revenue,
+        total_sales=SaleDailyRollupModel.total_sales + stmt.inserted.total_sales,
+        total_quantity=SaleDailyRollupModel.total_quantity + stmt.inserted.total_quantity
+    )
+    db.execute(stmt)
+
+    # Shared lock: waits for a running fold, which holds the watermark exclusively
+    watermark = db.query(RollupWatermarkModel.last_day).filter(
+        RollupWatermarkModel.name == PERIOD_WATERMARK
+    ).with_for_update(read=True).scalar()
+    if watermark is None:
+        return
+    periods: Dict[Tuple[str, date], List] = {}
+    for (day, _, _), (revenue, count, _) in rows.items():
+        if day > watermark:
+            continue
+        for period in PERIOD_TYPES:
+            total = periods.setdefault((period, period_start_for(day, period)), [0.0, 0])
+            total[0] += revenue
+            total[1] += count
+    for (period, period_start), (revenue, count) in periods.items():
+        _add_to_period(db, period, period_start, revenue, count)
+
+
+def rebuild(db: Session, start_day: date, end_day: date) -> int:
+    """Recompute the rollup rows for [start_day, end_day] from the raw sales.
+
+    Returns the number of rollup rows written. The caller is responsible for
+    committing.
+    """
+    range_start = datetime.combine(start_day, time.min)
+    range_end = datetime.combine(end_day + timedelta(days=1), time.min)
+
+    db.execute(
+        delete(SaleDailyRollupModel).where(
+            SaleDailyRollupModel.day >= start_day,
+            SaleDailyRollupModel.day <= end_day
+        )
+    )
+
+    day = func.date(SaleModel.sale_date)
+    source = select(
+        day,
+        SaleModel.product_id,
+        SaleModel.category_id,
+        func.sum(SaleModel.total_amount),
+        func.count(SaleModel.id),
+        func.sum(SaleModel.quantity)
+    ).where(
+        SaleModel.sale_date >= range_start,
+        SaleModel.sale_date < range_end
+    ).group_by(
+        day,
+        SaleModel.product_id,
+        SaleModel.category_id
+    )
+
+    result = db.execute(
+        insert(SaleDailyRollupModel).from_select(
+            ["day", "product_id", "category_id", "total_revenue", "total_sales", "total_quantity"],
+            source
+        )
+    )
+    return result.rowcount
+
+
+def split_range(
+    start_date: datetime,
+    end_date: datetime,
+    now: Optional[datetime] = None
+) -> Optional[Tuple[date, date]]:
+    """Return the closed whole days [first, last) of a range that the rollup can answer.
+
+    Only days that lie entirely inside [start_date, end_date] and are strictly
+    before today qualify; everything else has to come from the raw sales.
+    Returns None when no whole day qualifies.
+    """
+    if now is None:
+        now = datetime.now()
+    first = start_date.date()
+    if datetime.combine(first, time.min) < start_date:
+        first += timedelta(days=1)
+    last = min(end_date.date(), now.date())
+    if first >= last:
+        return None
+    return first, last
+
+
+def get_revenue_totals(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    include_end: bool = True
+) -> Tuple[float, int]:
+    """Total revenue and number of sales in [start_date, end_date], or [start_date, end_date) with include_end=False.
+
+    Whole closed days are read from the rollup; the partial edges of the range
+    (including the current day) are read from the raw sales.
+    """
+    days = split_range(start_date, end_date)
+    total_revenue, total_sales = 0.0, 0
+    if days is not None:
+        first, last = days
+        rollup = db.query(
+            func.sum(SaleDailyRollupModel.total_revenue),
+            func.sum(SaleDailyRollupModel.total_sales)
+        ).filter(
+            SaleDailyRollupModel.day >= first,
+            SaleDailyRollupModel.day < last
+        ).first()
+        total_revenue = float(rollup[0] or 0)
+        total_sales = int(rollup[1] or 0)
+
+    raw = db.query(
+        func.sum(SaleModel.total_amount),
+        func.count(SaleModel.id)
+    ).filter(_raw_filter(start_date, end_date, days, include_end)).first()
+
+    return total_revenue + float(raw[0] or 0), total_sales + int(raw[1] or 0)
+
+
+def get_category_totals(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[int, Tuple[float, int]]:
+    """Revenue and number of sales per category_id in [start_date, end_date].
+
+    Reads whole closed days from the rollup like get_revenue_totals, so the cost
+    grows with the number of days and categories rather than with the sales.
+    """
+    days = split_range(start_date, end_date)
+    totals: Dict[int, Tuple[float, int]] = {}
+    if days is not None:
+        first, last = days
+        rows = db.query(
+            SaleDailyRollupModel.category_id,
+            func.sum(SaleDailyRollupModel.total_revenue),
+            func.sum(SaleDailyRollupModel.total_sales)
+        ).filter(
+            SaleDailyRollupModel.day >= first,
+            SaleDailyRollupModel.day < last
+        ).group_by(SaleDailyRollupModel.category_id).all()
+        for category_id, revenue, sales in rows:
+            totals[category_id] = (float(revenue or 0), int(sales or 0))
+
+    raw = db.query(
+        SaleModel.category_id,
+        func.sum(SaleModel.total_amount),
+        func.count(SaleModel.id)
+    ).filter(
+        _raw_filter(start_date, end_date, days)
+    ).group_by(SaleModel.category_id).all()
+    for category_id, revenue, sales in raw:
+        current = totals.get(category_id, (0.0, 0))
+        totals[category_id] = (current[0] + float(revenue or 0), current[1] + int(sales or 0))
+    return totals
+
+
+def get_product_totals(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[int, Tuple[float, int]]:
+    """Revenue and number of sales per product_id in [start_date, end_date], rollup first like get_category_totals."""
+    days = split_range(start_date, end_date)
+    totals: Dict[int, Tuple[float, int]] = {}
+    if days is not None:
+        first, last = days
+        rows = db.query(
+            SaleDailyRollupModel.product_id,
+            func.sum(SaleDailyRollupModel.total_revenue),
+            func.sum(SaleDailyRollupModel.total_sales)
+        ).filter(
+            SaleDailyRollupModel.day >= first,
+            SaleDailyRollupModel.day < last
+        ).group_by(SaleDailyRollupModel.product_id).all()
+        for product_id, revenue, sales in rows:
+            totals[product_id] = (float(revenue or 0), int(sales or 0))
+
+    raw = db.query(
+        SaleModel.product_id,
+        func.sum(SaleModel.total_amount),
+        func.count(SaleModel.id)
+    ).filter(
+        _raw_filter(start_date, end_date, days)
+    ).group_by(SaleModel.product_id).all()
+    for product_id, revenue, sales in raw:
+        current = totals.get(product_id, (0.0, 0))
+        totals[product_id] = (current[0] + float(revenue or 0), current[1] + int(sales or 0))
+    return totals
+
+
+def get_daily_totals(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[date, Tuple[float, int]]:
+    """Revenue and number of sales per day in [start_date, end_date], rollup first."""
+    days = split_range(start_date, end_date)
+    totals: Dict[date, Tuple[float, int]] = {}
+    if days is not None:
+        first, last = days
+        rows = db.query(
+            SaleDailyRollupModel.day,
+            func.sum(SaleDailyRollupModel.total_revenue),
+            func.sum(SaleDailyRollupModel.total_sales)
+        ).filter(
+            SaleDailyRollupModel.day >= first,
+            SaleDailyRollupModel.day < last
+        ).group_by(SaleDailyRollupModel.day).all()
+        for day, revenue, sales in rows:
+            totals[day] = (float(revenue or 0), int(sales or 0))
+
+    sale_day = func.date(SaleModel.sale_date)
+    raw = db.query(
+        sale_day,
+        func.sum(SaleModel.total_amount),
+        func.count(SaleModel.id)
+    ).filter(
+        _raw_filter(start_date, end_date, days)
+    ).group_by(sale_day).all()
+    for day, revenue, sales in raw:
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        current = totals.get(day, (0.0, 0))
+        totals[day] = (current[0] + float(revenue or 0), current[1] + int(sales or 0))
+    return totals
+
+
+def _raw_filter(
+    start_date: datetime,
+    end_date: datetime,
+    days: Optional[Tuple[date, date]],
+    include_end: bool = True
+):
+    # The parts of [start_date, end_date] (or [start_date, end_date)) not covered by the rollup days
+    before_end = SaleModel.sale_date <= end_date if include_end else SaleModel.sale_date < end_date
+    if days is None:
+        return and_(
+            SaleModel.sale_date >= start_date,
+            before_end
+        )
+    first, last = days
+    return or_(
+        and_(
+            SaleModel.sale_date >= start_date,
+            SaleModel.sale_date < datetime.combine(first, time.min)
+        ),
+        and_(
+            SaleModel.sale_date >= datetime.combine(last, time.min),
+            before_end
+        )
+    )
+
+
+def period_start_for(day: date, period: str) -> date:
+    """Return the first day of the weekly/monthly/annual period containing day."""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def get_period_watermark(db: Session) -> Optional[date]:
+    """Last day already folded into the period rollups, or None if nothing was folded yet."""
+    return db.query(RollupWatermarkModel.last_day).filter(
+        RollupWatermarkModel.name == PERIOD_WATERMARK
+    ).scalar()
+
+
+def _add_to_period(db: Session, period: str, period_start: date, revenue: float, sales: int) -> None:
+    stmt = mysql_insert(SalePeriodRollupModel).values(
+        period_type=period,
+        period_start=period_start,
+        total_revenue=revenue,
+        total_sales=sales
+    )
+    stmt = stmt.on_duplicate_key_update(
+        total_revenue=SalePeriodRollupModel.total_revenue + stmt.inserted.total_revenue,
+        total_sales=SalePeriodRollupModel.total_sales + stmt.inserted.total_sales
+    )
+    db.execute(stmt)
+
+
+def fold_period_rollups(db: Session, today: Optional[date] = None) -> int:
+    """Fold closed days of the daily rollup into the weekly/monthly/annual rollups.
+
+    Only days after the watermark and before today are processed, and the
+    watermark row is locked for the whole run, so concurrent or repeated runs
+    never fold a day twice. Sales recorded while the lock is held see the new
+    watermark and update the period rollups themselves. Returns the number of
+    days folded.
+    """
+    if today is None:
+        today = date.today()
+    last_closed = today - timedelta(days=1)
+
+    first_day = db.query(func.min(SaleDailyRollupModel.day)).scalar()
+    if first_day is None:
+        return 0
+
+    db.execute(
+        mysql_insert(RollupWatermarkModel).prefix_with("IGNORE").values(
+            name=PERIOD_WATERMARK,
+            last_day=first_day - timedelta(days=1)
+        )
+    )
+    # Start a new transaction so the daily rollup is read after the lock is held
+    db.commit()
+    watermark = db.query(RollupWatermarkModel).filter(
+        RollupWatermarkModel.name == PERIOD_WATERMARK
+    ).with_for_update().one()
+    if watermark.last_day >= last_closed:
+        db.commit()
+        return 0
+
+    days = db.query(
+        SaleDailyRollupModel.day,
+        func.sum(SaleDailyRollupModel.total_revenue),
+        func.sum(SaleDailyRollupModel.total_sales)
+    ).filter(
+        SaleDailyRollupModel.day > watermark.last_day,
+        SaleDailyRollupModel.day <= last_closed
+    ).group_by(SaleDailyRollupModel.day).all()
+
+    totals = {}
+    for day, revenue, sales in days:
+        for period in PERIOD_TYPES:
+            key = (period, period_start_for(day, period))
+            current = totals.get(key, (0.0, 0))
+            totals[key] = (current[0] + float(revenue or 0), current[1] + int(sales or 0))
+
+    for (period, period_start), (revenue, sales) in totals.items():
+        _add_to_period(db, period, period_start, revenue, sales)
+
+    folded = (last_closed - watermark.last_day).days
+    watermark.last_day = last_closed
+    db.commit()
+    return folded
+
+
+def reset_period_rollups(db: Session) -> None:
+    """Drop the period rollups so the scheduler refolds them from the daily rollup.
+
+    Needed after the daily rollup was rebuilt for days already folded. The
+    caller is responsible for committing.
+    """
+    db.execute(delete(SalePeriodRollupModel))
+    db.execute(delete(RollupWatermarkModel).where(RollupWatermarkModel.name == PERIOD_WATERMARK))
+
+
+def get_folded_period_totals(
+    db: Session,
+    period: str,
+    period_starts: List[datetime]
+) -> Dict[datetime, Tuple[float, int]]:
+    """Revenue and number of sales of fully folded periods, keyed by period start.
+
+    Periods without a rollup row had no sales and are reported as zero.
+    """
+    if not period_starts:
+        return {}
+    rows = db.query(
+        SalePeriodRollupModel.period_start,
+        SalePeriodRollupModel.total_revenue,
+        SalePeriodRollupModel.total_sales
+    ).filter(
+        SalePeriodRollupModel.period_type == period,
+        SalePeriodRollupModel.period_start.in_([start.date() for start in period_starts])
+    ).all()
+    stored = {row.period_start: (float(row.total_revenue), int(row.total_sales)) for row in rows}
+    return {start: stored.get(start.date(), (0.0, 0)) for start in period_starts}
+
+
+def get_period_revenue_totals(
+    db: Session,
+    period: str,
+    start_date: datetime,
+    end_date: datetime,
+    include_end: bool = True
+) -> Tuple[float, int]:
+    """Total revenue and number of sales of a weekly/monthly/annual period.
+
+    start_date must be the first instant of the period; include_end=False
+    leaves out sales at exactly end_date. The folded part of the
+    period comes from its period rollup row; the days after the watermark are
+    stitched on from the daily rollup and the raw sales.
+    """
+    watermark = get_period_watermark(db)
+    if watermark is None or watermark < start_date.date():
+        return get_revenue_totals(db, start_date, end_date, include_end)
+
+    row = db.query(
+        SalePeriodRollupModel.total_revenue,
+        SalePeriodRollupModel.total_sales
+    ).filter(
+        SalePeriodRollupModel.period_type == period,
+        SalePeriodRollupModel.period_start == start_date.date()
+    ).first()
+    total_revenue = float(row.total_revenue) if row else 0.0
+    total_sales = int(row.total_sales) if row else 0
+
+    tail_start = datetime.combine(watermark + timedelta(days=1), time.min)
+    if tail_start <= end_date:
+        tail_revenue, tail_sales = get_revenue_totals(db, tail_start, end_date, include_end)
+        total_revenue += tail_revenue
+        total_sales += tail_sales
+    return total_revenue, total_sales
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Sequence
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+# Columns written by every export format, in order
+EXPORT_COLUMNS = ("id", "order_id", "product_id", "customer_id", "category_id", "quantity", "unit_price", "total_amount", "sale_date")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def iter_batches(db: Session, statement: Select, batch_size: int) -> Iterator[List[Sequence]]:
+    """Run statement on a server-side cursor and yield its rows batch_size at a time."""
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions(batch_size):
+        yield partition
+
+
+def encode_csv(batches: Iterator[List[Sequence]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            [*row[:-1], row[-1].isoformat() if row[-1] is not None else ""] for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(batches: Iterator[List[Sequence]]) -> Iterator[bytes]:
+    for batch in batches:
+        lines = [json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_default) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands out what was written since the last drain.
+
+    ``tell`` keeps counting across drains so the Parquet writer's column chunk
+    offsets stay correct.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def encode_parquet(batches: Iterator[List[Sequence]]) -> Iterator[bytes]:
+    """Write one Parquet row group per batch, yielding the bytes as they are produced."""
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("order_id", pa.int64()),
+        ("product_id", pa.int64()),
+        ("customer_id", pa.int64()),
+        ("category_id", pa.int64()),
+        ("quantity", pa.int64()),
+        ("unit_price", pa.float64()),
+        ("total_amount", pa.float64()),
+        ("sale_date", pa.timestamp("us")),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+}
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy import case, insert, tuple_, update
+from sqlalchemy.orm import Session
+from app.models import (
+    Sale as SaleModel,
+    Product as ProductModel,
+    Inventory as InventoryModel,
+    InventoryHistory as InventoryHistoryModel,
+    Order as OrderModel,
+    OrderItem as OrderItemModel
+)
+from app.schemas.sale import SaleCreate
+from app.services import analytics_cache, order_payments, reservations, rollup
+
+
+def ingest_sales(db: Session, lines: Sequence[SaleCreate]) -> Tuple[datetime, List[Dict[str, Any]]]:
+    """Validate and write a batch of sale lines with set-based statements.
+
+    Lines are checked the same way as in create_sale, in order, with inventory
+    and reservations consumed by earlier lines of the batch counted against
+    later ones. Invalid
+    lines are rejected individually; the valid ones are written with a fixed
+    number of statements regardless of the batch size. Returns the sale date
+    used for the batch and one {"index", "status", "error"} result per line.
+    The caller is responsible for committing.
+    """
+    results = [{"index": index, "status": "created", "error": None} for index in range(len(lines))]
+
+    def reject(index: int, error: str) -> None:
+        results[index]["status"] = "rejected"
+        results[index]["error"] = error
+
+    order_ids = {line.order_id for line in lines}
+    product_ids = {line.product_id for line in lines}
+    # Lock the orders, then the inventory rows, in a fixed order so concurrent
+    # batches, single sales and order edits cannot deadlock
+    order_customers = dict(
+        db.query(OrderModel.id, OrderModel.customer_id).filter(
+            OrderModel.id.in_(list(order_ids))
+        ).order_by(OrderModel.id).with_for_update().all()
+    )
+    categories = dict(
+        db.query(ProductModel.id, ProductModel.category_id).filter(ProductModel.id.in_(list(product_ids))).all()
+    )
+    inventories = {
+        row.product_id: row
+        for row in db.query(
+            InventoryModel.id, InventoryModel.product_id, InventoryModel.quantity, InventoryModel.reserved
+        ).filter(
+            InventoryModel.product_id.in_(list(product_ids))
+        ).order_by(InventoryModel.product_id).with_for_update()
+    }
+    available = {product_id: row.quantity - row.reserved for product_id, row in inventories.items()}
+    # Stock each order has reserved; a line uses its order's reservation before unreserved stock
+    held = reservations.lock_reservations(db, {(line.order_id, line.product_id) for line in lines})
+    held_left = {pair: quantity for pair, (reservation_id, quantity) in held.items()}
+    taken: Dict[int, int] = defaultdict(int)
+    from_reserved: Dict[int, int] = defaultdict(int)
+
+    accepted = []
+    for index, line in enumerate(lines):
+        if order_customers.get(line.order_id) != line.customer_id:
+            reject(index, "Order not found or doesn't belong to the customer")
+        elif line.product_id not in categories:
+            reject(index, "Product not found")
+        elif line.product_id not in inventories:
+            reject(index, "Inventory not found")
+        else:
+            pair = (line.order_id, line.product_id)
+            reserved = min(line.quantity, held_left.get(pair, 0))
+            if available[line.product_id] < line.quantity - reserved:
+                reject(index, "Insufficient inventory")
+            else:
+                available[line.product_id] -= line.quantity - reserved
+                if reserved:
+                    held_left[pair] -= reserved
+                    taken[held[pair][0]] += reserved
+                    from_reserved[line.product_id] += reserved
+                accepted.append(line)
+
+    # Whole seconds, as stored; sale_date is part of the primary key
+    sale_date = datetime.now().replace(microsecond=0)
+    if not accepted:
+        return sale_date, results
+
+    # Inventory: one UPDATE with the per-product decrements in a CASE
+    decrements: Dict[int, int] = defaultdict(int)
+    for line in accepted:
+        decrements[line.product_id] += line.quantity
+    values = {"quantity": InventoryModel.quantity - case(decrements, value=InventoryModel.product_id)}
+    if from_reserved:
+        values["reserved"] = InventoryModel.reserved - case(from_reserved, value=InventoryModel.product_id, else_=0)
+    db.execute(
+        update(InventoryModel).where(
+            InventoryModel.product_id.in_(list(decrements))
+        ).values(**values).execution_options(synchronize_session=False)
+    )
+    reservations.consume(db, taken)
+
+    # Orders: MySQL assigns left to right, so total sees the new subtotal and the
+    # payment status the new total
+    subtotals: Dict[int, float] = defaultdict(float)
+    for line in accepted:
+        subtotals[line.order_id] += float(line.total_amount)
+    db.execute(
+        update(OrderModel).where(
+            OrderModel.id.in_(list(subtotals))
+        ).ordered_values(
+            (OrderModel.subtotal, OrderModel.subtotal + case(subtotals, value=OrderModel.id)),
+            (OrderModel.total, OrderModel.subtotal + OrderModel.shipping_cost + OrderModel.tax),
+            (OrderModel.payment_status, order_payments.payment_status_case(OrderModel.amount_paid, OrderModel.total))
+        ).execution_options(synchronize_session=False)
+    )
+
+    # Order items: add to the existing (order, product) item or create one
+    items: Dict[Tuple[int, int], List] = {}
+    for line in accepted:
+        item = items.setdefault((line.order_id, line.product_id), [0, 0.0, float(line.unit_price)])
+        item[0] += line.quantity
+        item[1] += float(line.total_amount)
+    existing: Dict[Tuple[int, int], int] = {}
+    for item_id, order_id, product_id in db.query(
+        OrderItemModel.id, OrderItemModel.order_id, OrderItemModel.product_id
+    ).filter(
+        tuple_(OrderItemModel.order_id, OrderItemModel.product_id).in_(list(items))
+    ).order_by(OrderItemModel.id):
+        existing.setdefault((order_id, product_id), item_id)
+    if existing:
+        quantities = {item_id: items[key][0] for key, item_id in existing.items()}
+        totals = {item_id: items[key][1] for key, item_id in existing.items()}
+        db.execute(
+            update(OrderItemModel).where(
+                OrderItemModel.id.in_(list(quantities))
+            ).values(
+                quantity=OrderItemModel.quantity + case(quantities, value=OrderItemModel.id),
+                total_price=OrderItemModel.total_price + case(totals, value=OrderItemModel.id)
+            ).execution_options(synchronize_session=False)
+        )
+    new_items = [key for key in items if key not in existing]
+    if new_items:
+        db.execute(insert(OrderItemModel), [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": items[(order_id, product_id)][0],
+                "unit_price": items[(order_id, product_id)][2],
+                "total_price": items[(order_id, product_id)][1]
+            }
+            for order_id, product_id in new_items
+        ])
+
+    # Children last, once every row they refer to is locked
+    db.execute(insert(SaleModel), [
+        {
+            "product_id": line.product_id,
+            "order_id": line.order_id,
+            "customer_id": line.customer_id,
+            "category_id": categories[line.product_id],
+            "quantity": line.quantity,
+            "unit_price": float(line.unit_price),
+            "total_amount": float(line.total_amount),
+            "sale_date": sale_date
+        }
+        for line in accepted
+    ])
+    db.execute(insert(InventoryHistoryModel), [
+        {
+            "inventory_id": inventories[line.product_id].id,
+            "quantity_change": -line.quantity,
+            "reason": f"sale for order #{line.order_id}"
+        }
+        for line in accepted
+    ])
+
+    rollup.record_sales(db, [
+        (sale_date, line.product_id, categories[line.product_id], float(line.total_amount), line.quantity)
+        for line in accepted
+    ])
+    # Core inserts are invisible to the cache's flush hook
+    analytics_cache.note_sale_dates(db, [sale_date])
+    return sale_date, results
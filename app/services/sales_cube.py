@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import get_read_session
+from app.models import Sale as SaleModel
+
+logger = logging.getLogger(__name__)
+
+# Rows read per statement when loading or tailing the cube
+LOAD_BATCH_SIZE = 50000
+
+COLUMNS = ("id", "sale_date", "product_id", "category_id", "customer_id", "quantity", "total_amount")
+DTYPES = {
+    "id": np.int64,
+    "sale_date": "datetime64[us]",
+    "product_id": np.int64,
+    "category_id": np.int64,
+    "customer_id": np.int64,
+    "quantity": np.int64,
+    "total_amount": np.float64,
+}
+
+
+def _to_datetime64(value: datetime) -> np.datetime64:
+    return np.datetime64(value.replace(tzinfo=None), "us")
+
+
+class SalesCube:
+    """In-process columnar copy of the sale table for fast analytics slicing.
+
+    Columns are NumPy arrays sorted by sale_date, so a date range is two
+    ``searchsorted`` calls and a group-by is a ``bincount`` over the slice.
+    New sales are picked up by tailing every row dated within
+    ``tail_overlap_seconds`` of the newest one loaded and skipping the ids
+    already present, so a sale that commits after a later one is still
+    caught. The full load reads the table in id-keyset chunks on its own
+    session, outside the analytics statement budget; periodic reloads run in
+    a background thread while requests keep using the current copy.
+    """
+
+    def __init__(self, refresh_seconds: float, reload_seconds: float, tail_overlap_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self.tail_overlap_seconds = tail_overlap_seconds
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._refreshed_at = 0.0
+        self._loaded_at = 0.0
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def _fetch(self, db: Session, *criteria) -> Dict[str, np.ndarray]:
+        """Read the sales matching criteria in id order, LOAD_BATCH_SIZE rows per statement."""
+        values: Dict[str, list] = {name: [] for name in COLUMNS}
+        after_id = 0
+        while True:
+            rows = db.query(
+                SaleModel.id,
+                SaleModel.sale_date,
+                SaleModel.product_id,
+                SaleModel.category_id,
+                SaleModel.customer_id,
+                SaleModel.quantity,
+                SaleModel.total_amount
+            ).filter(
+                *criteria, SaleModel.id > after_id
+            ).order_by(SaleModel.id).limit(LOAD_BATCH_SIZE).all()
+            for index, name in enumerate(COLUMNS):
+                if name == "sale_date":
+                    values[name].extend(row[index].replace(tzinfo=None) for row in rows)
+                else:
+                    values[name].extend(row[index] for row in rows)
+            if len(rows) < LOAD_BATCH_SIZE:
+                break
+            after_id = rows[-1].id
+        return {name: np.array(values[name], dtype=DTYPES[name]) for name in COLUMNS}
+
+    def _sorted(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        order = np.argsort(columns["sale_date"], kind="stable")
+        return {name: values[order] for name, values in columns.items()}
+
+    def _build(self) -> Dict[str, np.ndarray]:
+        # A dedicated session carries no statement budget, unlike the request's
+        db = get_read_session()
+        try:
+            return self._sorted(self._fetch(db))
+        finally:
+            db.close()
+
+    def _install(self, columns: Dict[str, np.ndarray]) -> None:
+        self._columns = columns
+        self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def load(self) -> None:
+        """Load every sale from the database, replacing the current contents."""
+        with self._lock:
+            self._install(self._build())
+
+    def _reload_in_background(self) -> None:
+        # Called with the lock held
+        if self._reloading:
+            return
+        self._reloading = True
+        threading.Thread(target=self._background_reload, name="sales-cube-reload", daemon=True).start()
+
+    def _background_reload(self) -> None:
+        try:
+            columns = self._build()
+            with self._lock:
+                self._install(columns)
+        except Exception:
+            logger.warning("Sales cube reload failed", exc_info=True)
+        finally:
+            self._reloading = False
+
+    def _tail(self, db: Session) -> None:
+        current = self._columns
+        dates = current["sale_date"]
+        if len(dates):
+            since = dates[-1] - np.timedelta64(int(self.tail_overlap_seconds * 1_000_000), "us")
+            new = self._fetch(db, SaleModel.sale_date >= since.astype(datetime))
+            # Drop the rows of the overlap window that are already loaded
+            known = current["id"][np.searchsorted(dates, since, side="left"):]
+            fresh = ~np.isin(new["id"], known)
+            new = {name: values[fresh] for name, values in new.items()}
+        else:
+            new = self._fetch(db)
+        self._refreshed_at = time.monotonic()
+        if not len(new["id"]):
+            return
+        merged = {name: np.concatenate((current[name], new[name])) for name in COLUMNS}
+        # Sales normally arrive in date order; only re-sort when they did not
+        tail_dates = merged["sale_date"][max(len(current["id"]) - 1, 0):]
+        if np.any(tail_dates[1:] < tail_dates[:-1]):
+            merged = self._sorted(merged)
+        self._columns = merged
+
+    def refresh(self, db: Session) -> None:
+        """Bring the cube up to date by tailing, starting a background reload when one is due.
+
+        The first call loads the whole cube. Only one request per process does
+        the work; concurrent callers wait for it and then find the cube fresh.
+        """
+        if self._columns is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._columns is None:
+                self._install(self._build())
+                return
+            now = time.monotonic()
+            if now - self._loaded_at >= self.reload_seconds:
+                self._reload_in_background()
+            if now - self._refreshed_at >= self.refresh_seconds:
+                self._tail(db)
+
+    def _slice(self, start_date: datetime, end_date: datetime, include_end: bool = True) -> Tuple[Dict[str, np.ndarray], int, int]:
+        columns = self._columns
+        dates = columns["sale_date"]
+        lo = np.searchsorted(dates, _to_datetime64(start_date), side="left")
+        hi = np.searchsorted(dates, _to_datetime64(end_date), side="right" if include_end else "left")
+        return columns, lo, hi
+
+    def revenue(self, start_date: datetime, end_date: datetime, include_end: bool = True) -> Tuple[float, int]:
+        """Total revenue and number of sales between start_date and end_date."""
+        columns, lo, hi = self._slice(start_date, end_date, include_end)
+        return float(columns["total_amount"][lo:hi].sum()), int(hi - lo)
+
+    def category_breakdown(self, start_date: datetime, end_date: datetime) -> Dict[int, Tuple[float, int]]:
+        """Revenue and number of sales per category_id between start_date and end_date."""
+        columns, lo, hi = self._slice(start_date, end_date)
+        categories = columns["category_id"][lo:hi]
+        if not len(categories):
+            return {}
+        revenue = np.bincount(categories, weights=columns["total_amount"][lo:hi])
+        sales = np.bincount(categories)
+        present = np.nonzero(sales)[0]
+        return {int(c): (float(revenue[c]), int(sales[c])) for c in present}
+
+
+cube = SalesCube(
+    refresh_seconds=settings.ANALYTICS_CUBE_REFRESH_SECONDS,
+    reload_seconds=settings.ANALYTICS_CUBE_RELOAD_SECONDS,
+    tail_overlap_seconds=settings.ANALYTICS_CUBE_TAIL_OVERLAP_SECONDS
+)
+
+
+def use_cube(endpoint: str) -> bool:
+    """Whether the given analytics endpoint is configured to be served from the cube."""
+    return endpoint in settings.ANALYTICS_CUBE_ENDPOINTS
+
+
+def get_cube(db: Session) -> SalesCube:
+    """Return the process-wide cube, loading or tailing it first if it is stale."""
+    cube.refresh(db)
+    return cube
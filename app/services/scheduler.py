@@ -0,0 +1,175 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import SchedulerLock as SchedulerLockModel
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK = "background_scheduler"
+
+
+class Job:
+    """A periodic job together with its run metrics."""
+
+    def __init__(self, name: str, fn: Callable[[Session], Any]):
+        self.name = name
+        self.fn = fn
+        self.runs = 0
+        self.failures = 0
+        self.last_started_at: Optional[datetime] = None
+        self.last_succeeded_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at,
+            "last_succeeded_at": self.last_succeeded_at,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_result": None if self.last_result is None else str(self.last_result),
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """In-process periodic job runner with leader election through a lock row.
+
+    Every worker runs the scheduler thread, but on each tick only the worker
+    holding the ``scheduler_lock`` row runs the jobs. The leader renews the row
+    on every tick; if it dies, another worker takes over once the lock expires.
+    """
+
+    def __init__(self, session_factory: sessionmaker, interval_seconds: float, lock_ttl_seconds: float):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._jobs: List[Job] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, fn: Callable[[Session], Any]) -> None:
+        """Add a job; fn receives a fresh session and is run once per tick by the leader."""
+        self._jobs.append(Job(name, fn))
+
+    def _acquire(self, db: Session) -> bool:
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.lock_ttl_seconds)
+        db.execute(
+            mysql_insert(SchedulerLockModel).prefix_with("IGNORE").values(
+                name=LEADER_LOCK, owner=self.owner, expires_at=expires_at
+            )
+        )
+        # Renew our own lock or take over an expired one
+        result = db.execute(
+            update(SchedulerLockModel).where(
+                SchedulerLockModel.name == LEADER_LOCK,
+                or_(
+                    SchedulerLockModel.owner == self.owner,
+                    SchedulerLockModel.expires_at < now
+                )
+            ).values(owner=self.owner, expires_at=expires_at)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def _release(self, db: Session) -> None:
+        db.execute(
+            update(SchedulerLockModel).where(
+                SchedulerLockModel.name == LEADER_LOCK,
+                SchedulerLockModel.owner == self.owner
+            ).values(expires_at=datetime.now())
+        )
+        db.commit()
+
+    def run_once(self) -> None:
+        """Run every job if this worker is (or becomes) the leader."""
+        db = self.session_factory()
+        try:
+            self.is_leader = self._acquire(db)
+        except Exception:
+            db.rollback()
+            self.is_leader = False
+            logger.exception("Failed to acquire the scheduler lock")
+        finally:
+            db.close()
+        if not self.is_leader:
+            return
+
+        for job in self._jobs:
+            job.runs += 1
+            job.last_started_at = datetime.now()
+            started = time.monotonic()
+            db = self.session_factory()
+            try:
+                job.last_result = job.fn(db)
+                job.last_succeeded_at = datetime.now()
+                job.last_error = None
+            except Exception as e:
+                db.rollback()
+                job.failures += 1
+                job.last_error = str(e)
+                logger.exception("Scheduled job %s failed", job.name)
+            finally:
+                db.close()
+                job.last_duration_seconds = time.monotonic() - started
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="background-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread and hand the lock over so another worker can lead right away."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval_seconds)
+        self._thread = None
+        if self.is_leader:
+            db = self.session_factory()
+            try:
+                self._release(db)
+            except Exception:
+                logger.exception("Failed to release the scheduler lock")
+            finally:
+                db.close()
+            self.is_leader = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "owner": self.owner,
+            "running": self._thread is not None,
+            "is_leader": self.is_leader,
+            "interval_seconds": self.interval_seconds,
+            "jobs": [job.stats() for job in self._jobs],
+        }
+
+
+scheduler = Scheduler(
+    session_factory=SessionLocal,
+    interval_seconds=settings.SCHEDULER_INTERVAL_SECONDS,
+    lock_ttl_seconds=settings.SCHEDULER_LOCK_TTL_SECONDS
+)
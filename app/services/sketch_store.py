@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import (
+    Sale as SaleModel,
+    Order as OrderModel,
+    OrderStatus,
+    SaleDailySketch as SaleDailySketchModel
+)
+from app.services.sketches import HyperLogLog, SpaceSaving, TDigest
+
+logger = logging.getLogger(__name__)
+
+
+class SketchKind:
+    """How to create and deserialize one kind of per-day sketch."""
+
+    def __init__(self, factory: Callable[[], Any], loader: Callable[[bytes], Any]):
+        self.factory = factory
+        self.loader = loader
+
+
+KINDS: Dict[str, SketchKind] = {
+    "top_products": SketchKind(
+        lambda: SpaceSaving(settings.TOP_K_SKETCH_CAPACITY), SpaceSaving.from_bytes
+    ),
+    "top_customers": SketchKind(
+        lambda: SpaceSaving(settings.TOP_K_SKETCH_CAPACITY), SpaceSaving.from_bytes
+    ),
+    "unique_customers": SketchKind(
+        lambda: HyperLogLog(settings.HLL_PRECISION), HyperLogLog.from_bytes
+    ),
+    "order_value": SketchKind(
+        lambda: TDigest(settings.TDIGEST_COMPRESSION), TDigest.from_bytes
+    ),
+}
+
+# Kinds derived from sale rows, i.e. the ones rebuilt from the sale table
+SALE_KINDS = ("top_products", "top_customers", "unique_customers")
+
+# Kinds derived from order rows
+ORDER_KINDS = ("order_value",)
+
+# Orders counted in order_value, each once, with its total when it first
+# enters one of these statuses; totals still change while an order is open
+ORDER_VALUE_STATUSES = (OrderStatus.DELIVERED, OrderStatus.RETURNED)
+
+
+def _sketch_for(sketches: Dict[Tuple[date, str], Any], day: date, kind: str) -> Any:
+    sketch = sketches.get((day, kind))
+    if sketch is None:
+        sketch = sketches[(day, kind)] = KINDS[kind].factory()
+    return sketch
+
+
+def _feed_sale(
+    sketches: Dict[Tuple[date, str], Any],
+    sale_date: datetime,
+    product_id: int,
+    customer_id: int,
+    total_amount: float
+) -> None:
+    day = sale_date.date()
+    _sketch_for(sketches, day, "top_products").update(product_id, total_amount)
+    _sketch_for(sketches, day, "top_customers").update(customer_id, total_amount)
+    _sketch_for(sketches, day, "unique_customers").add(customer_id)
+
+
+class SketchStore:
+    """Per-day analytics sketches, buffered in memory and merged into the database.
+
+    Writes go into an in-process delta per (day, kind). ``flush`` merges each
+    delta into its stored row under a row lock, so several workers can flush
+    concurrently without losing updates. Reads merge the stored rows for a
+    range with the deltas that have not been flushed yet.
+    """
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[Tuple[date, str], Any] = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def record_sale(self, sale_date: datetime, product_id: int, customer_id: int, total_amount: float) -> None:
+        with self._lock:
+            _feed_sale(self._pending, sale_date or datetime.now(), product_id, customer_id, float(total_amount))
+
+    def record_order(self, order_date: datetime, total: float) -> None:
+        with self._lock:
+            day = (order_date or datetime.now()).date()
+            _sketch_for(self._pending, day, "order_value").add(float(total))
+
+    def flush(self, db: Session) -> int:
+        """Merge all pending deltas into the database. Returns the number of rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            for (day, kind), delta in pending.items():
+                # Make sure the row exists so it can be locked, then merge under the lock
+                db.execute(
+                    mysql_insert(SaleDailySketchModel).prefix_with("IGNORE").values(
+                        day=day, kind=kind, payload=KINDS[kind].factory().to_bytes()
+                    )
+                )
+                row = db.query(SaleDailySketchModel).filter(
+                    SaleDailySketchModel.day == day,
+                    SaleDailySketchModel.kind == kind
+                ).with_for_update().one()
+                stored = KINDS[kind].loader(row.payload)
+                row.payload = stored.merge(delta).to_bytes()
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for key, delta in pending.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = delta.merge(newer) if newer is not None else delta
+            raise
+        return len(pending)
+
+    def flush_if_due(self, db: Session) -> None:
+        """Flush when the flush interval has elapsed; failures are logged, not raised."""
+        if time.monotonic() - self._flushed_at < self.flush_seconds:
+            return
+        try:
+            self.flush(db)
+        except Exception:
+            logger.exception("Failed to flush analytics sketches")
+
+    def merged(self, db: Session, kind: str, start_day: date, end_day: date) -> Any:
+        """Merge the sketches of one kind for every day in [start_day, end_day]."""
+        result = KINDS[kind].factory()
+        rows = db.query(SaleDailySketchModel.payload).filter(
+            SaleDailySketchModel.kind == kind,
+            SaleDailySketchModel.day >= start_day,
+            SaleDailySketchModel.day <= end_day
+        ).all()
+        for row in rows:
+            result.merge(KINDS[kind].loader(row.payload))
+        with self._lock:
+            for (day, pending_kind), delta in self._pending.items():
+                if pending_kind == kind and start_day <= day <= end_day:
+                    result.merge(delta)
+        return result
+
+
+store = SketchStore(flush_seconds=settings.SKETCH_FLUSH_SECONDS)
+
+
+def rebuild(db: Session, start_day: date, end_day: date) -> int:
+    """Recompute the per-day sketches for [start_day, end_day] from raw sales and orders.
+
+    Returns the number of sketch rows written. The caller is responsible for
+    committing.
+    """
+    range_start = datetime.combine(start_day, datetime.min.time())
+    range_end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+    db.execute(
+        delete(SaleDailySketchModel).where(
+            SaleDailySketchModel.kind.in_(SALE_KINDS + ORDER_KINDS),
+            SaleDailySketchModel.day >= start_day,
+            SaleDailySketchModel.day <= end_day
+        )
+    )
+
+    sketches: Dict[Tuple[date, str], Any] = {}
+    sales = db.query(
+        SaleModel.sale_date,
+        SaleModel.product_id,
+        SaleModel.customer_id,
+        SaleModel.total_amount
+    ).filter(
+        SaleModel.sale_date >= range_start,
+        SaleModel.sale_date < range_end
+    ).yield_per(10000)
+    for row in sales:
+        _feed_sale(sketches, row.sale_date, row.product_id, row.customer_id, row.total_amount)
+
+    orders = db.query(
+        OrderModel.order_date,
+        OrderModel.total
+    ).filter(
+        OrderModel.order_date >= range_start,
+        OrderModel.order_date < range_end,
+        OrderModel.status.in_(ORDER_VALUE_STATUSES)
+    ).yield_per(10000)
+    for row in orders:
+        _sketch_for(sketches, row.order_date.date(), "order_value").add(float(row.total))
+
+    for (day, kind), sketch in sketches.items():
+        db.add(SaleDailySketchModel(day=day, kind=kind, payload=sketch.to_bytes()))
+    return len(sketches)
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import math
+from typing import Dict, Hashable, List, Tuple
+import numpy as np
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) with weighted updates.
+
+    Keeps at most ``capacity`` counters. Every reported count overestimates the
+    true weight of its key by at most the key's ``error``, and any key whose true
+    weight exceeds the smallest counter is guaranteed to be tracked. Sketches
+    are mergeable, so per-day sketches can be combined for arbitrary ranges.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: Dict[Hashable, List[float]] = {}
+
+    def update(self, key: Hashable, weight: float = 1.0) -> None:
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [weight, 0.0]
+        else:
+            # Evict the smallest counter; the newcomer inherits its count as error
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[key] = [floor + weight, floor]
+
+    def min_count(self) -> float:
+        if len(self.counters) < self.capacity:
+            return 0.0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Merge another sketch into this one and return self."""
+        own_floor = self.min_count()
+        other_floor = other.min_count()
+        merged: Dict[Hashable, List[float]] = {}
+        for key in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(key, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(key, (other_floor, other_floor))
+            merged[key] = [count + other_count, error + other_error]
+        if len(merged) > self.capacity:
+            keep = sorted(merged, key=lambda k: merged[k][0], reverse=True)[:self.capacity]
+            merged = {key: merged[key] for key in keep}
+        self.counters = merged
+        return self
+
+    def top(self, n: int) -> List[Tuple[Hashable, float, float]]:
+        """Return up to n (key, estimated weight, max overestimate) tuples, heaviest first."""
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "capacity": self.capacity,
+            "counters": [[key, count, error] for key, (count, error) in self.counters.items()],
+        }).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "SpaceSaving":
+        data = json.loads(payload.decode("utf-8"))
+        sketch = cls(data["capacity"])
+        sketch.counters = {key: [count, error] for key, count, error in data["counters"]}
+        return sketch
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (Flajolet et al.) with 2**precision registers.
+
+    The relative standard error of an estimate is about 1.04 / sqrt(2**precision),
+    i.e. ~1.6% at the default precision of 12 (4 KiB of registers per sketch).
+    Sketches with the same precision merge losslessly by taking register maxima,
+    so per-day sketches answer any range of days with the same error bound.
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @staticmethod
+    def _hash(value: Hashable) -> int:
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def add(self, value: Hashable) -> None:
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch into this one and return self."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        merged = np.maximum(
+            np.frombuffer(self.registers, dtype=np.uint8),
+            np.frombuffer(other.registers, dtype=np.uint8)
+        )
+        self.registers = bytearray(merged.tobytes())
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "HyperLogLog":
+        sketch = cls(payload[0])
+        sketch.registers = bytearray(payload[1:])
+        return sketch
+
+
+class TDigest:
+    """Merging t-digest (Dunning & Ertl) for mergeable quantile estimates.
+
+    Values are summarised by at most roughly ``compression`` weighted
+    centroids, kept small near the tails so extreme quantiles (p99) stay
+    accurate. Digests merge by re-compressing their combined centroids.
+    """
+
+    def __init__(self, compression: float = 200):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[float, float]] = []
+
+    @property
+    def total_weight(self) -> float:
+        return sum(self.weights) + sum(weight for _, weight in self._buffer)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._buffer.append((value, weight))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Merge another digest into this one and return self."""
+        self._buffer.extend(zip(other.means, other.weights))
+        self._buffer.extend(other._buffer)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        angle = min(max(2 * math.pi * k / self.compression, -math.pi / 2), math.pi / 2)
+        return (1 + math.sin(angle)) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in items)
+
+        means: List[float] = []
+        weights: List[float] = []
+        seen = 0.0
+        limit = total * self._k_inverse(self._k(0) + 1)
+        current_mean, current_weight = items[0]
+        for mean, weight in items[1:]:
+            if seen + current_weight + weight <= limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                seen += current_weight
+                limit = total * self._k_inverse(self._k(seen / total) + 1)
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        """Estimate the value at quantile q (0..1); NaN for an empty digest."""
+        self._compress()
+        if not self.means:
+            return math.nan
+        if len(self.means) == 1:
+            return self.means[0]
+
+        total = sum(self.weights)
+        target = q * total
+        # Cumulative weight at each centroid's centre
+        centers = []
+        cumulative = 0.0
+        for weight in self.weights:
+            centers.append(cumulative + weight / 2)
+            cumulative += weight
+
+        if target <= centers[0]:
+            return self._interpolate(target, 0.0, centers[0], self.min, self.means[0])
+        if target >= centers[-1]:
+            return self._interpolate(target, centers[-1], total, self.means[-1], self.max)
+        for i in range(len(centers) - 1):
+            if target < centers[i + 1]:
+                return self._interpolate(target, centers[i], centers[i + 1], self.means[i], self.means[i + 1])
+        return self.max
+
+    @staticmethod
+    def _interpolate(x: float, x0: float, x1: float, y0: float, y1: float) -> float:
+        if x1 <= x0:
+            return y0
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        header = [self.compression, self.min, self.max]
+        return np.array(header + self.means + self.weights, dtype=np.float64).tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "TDigest":
+        values = np.frombuffer(payload, dtype=np.float64).tolist()
+        sketch = cls(values[0])
+        sketch.min, sketch.max = values[1], values[2]
+        size = (len(values) - 3) // 2
+        sketch.means = values[3:3 + size]
+        sketch.weights = values[3 + size:]
+        return sketch
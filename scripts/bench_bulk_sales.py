@@ -0,0 +1,85 @@
+import sys
+import os
+import argparse
+import random
+import time
+from decimal import Decimal
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import SessionLocal
+from app.models import Order, Product, Inventory
+from app.schemas.sale import SaleCreate, SaleBulkCreate
+from app.api.v1.endpoints.sales import create_sale, create_sales_bulk
+
+
+def bench_bulk_sales(lines: int, batch_size: int, seed: int):
+    """Compare POST /sales one line at a time with POST /sales/bulk.
+
+    Writes real sales, so run it against a scratch database seeded with
+    scripts/demo_data.py. Inventory of the products used is topped up first.
+    """
+    random.seed(seed)
+    db = SessionLocal()
+    try:
+        orders = db.query(Order.id, Order.customer_id).limit(50).all()
+        products = db.query(Product.id, Product.price).join(
+            Inventory, Inventory.product_id == Product.id
+        ).limit(50).all()
+        if not orders or not products:
+            print("No orders or stocked products found, run scripts/demo_data.py first.")
+            return
+
+        db.query(Inventory).filter(
+            Inventory.product_id.in_([product.id for product in products])
+        ).update({Inventory.quantity: Inventory.quantity + 2 * lines}, synchronize_session=False)
+        db.commit()
+
+        def make_lines():
+            sales = []
+            for _ in range(lines):
+                order = random.choice(orders)
+                product = random.choice(products)
+                quantity = random.randint(1, 3)
+                price = Decimal(str(product.price)).quantize(Decimal("0.01"))
+                sales.append(SaleCreate(
+                    product_id=product.id,
+                    order_id=order.id,
+                    customer_id=order.customer_id,
+                    quantity=quantity,
+                    unit_price=price,
+                    total_amount=price * quantity
+                ))
+            return sales
+
+        single_lines = make_lines()
+        start = time.perf_counter()
+        for sale in single_lines:
+            create_sale(sale, db=db, current_user=None)
+        single_seconds = time.perf_counter() - start
+
+        bulk_lines = make_lines()
+        start = time.perf_counter()
+        for offset in range(0, lines, batch_size):
+            create_sales_bulk(SaleBulkCreate(sales=bulk_lines[offset:offset + batch_size]), db=db, current_user=None)
+        bulk_seconds = time.perf_counter() - start
+
+        print(f"Sale ingestion benchmark: {lines} lines, bulk batches of {batch_size}")
+        print(f"  single: {lines / single_seconds:10,.0f} lines/s ({single_seconds:.2f}s)")
+        print(f"  bulk:   {lines / bulk_seconds:10,.0f} lines/s ({bulk_seconds:.2f}s)")
+        print(f"  speedup: {single_seconds / bulk_seconds:.1f}x")
+    except Exception as e:
+        print(f"Error running sale ingestion benchmark: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark single vs bulk sale ingestion (writes data).")
+    parser.add_argument("--lines", type=int, default=2000, help="Sale lines ingested by each method")
+    parser.add_argument("--batch-size", type=int, default=500, help="Lines per bulk request")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    bench_bulk_sales(args.lines, args.batch_size, args.seed)
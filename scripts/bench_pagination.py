@@ -0,0 +1,62 @@
+import sys
+import os
+import argparse
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import SessionLocal
+from app.models import Sale
+from app.api.pagination import encode_cursor, paginate
+
+SORT_COLUMNS = [Sale.sale_date, Sale.id]
+
+
+def timed(fn, repeat: int) -> float:
+    """Best wall time of fn over repeat runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_pagination(pages, page_size: int, repeat: int):
+    """Compare offset and cursor paging of the sale list at increasing page depths."""
+    db = SessionLocal()
+    try:
+        total = db.query(Sale).count()
+        print(f"Sale list pagination benchmark: {total} sales, {page_size} per page, best of {repeat}")
+        print(f"{'page':>8} {'offset ms':>12} {'cursor ms':>12}")
+        for page in pages:
+            skip = (page - 1) * page_size
+            if skip >= total:
+                print(f"{page:>8} {'(past the end)':>25}")
+                continue
+            offset_ms = timed(lambda: paginate(db.query(Sale), SORT_COLUMNS, skip, page_size, descending=True), repeat)
+
+            # The cursor a client would hold after reading the previous page
+            cursor = None
+            if skip:
+                last = db.query(Sale.sale_date, Sale.id).order_by(
+                    Sale.sale_date.desc(), Sale.id.desc()
+                ).offset(skip - 1).limit(1).first()
+                cursor = encode_cursor([last.sale_date, last.id])
+            cursor_ms = timed(lambda: paginate(db.query(Sale), SORT_COLUMNS, 0, page_size, cursor, descending=True), repeat)
+
+            print(f"{page:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}")
+    except Exception as e:
+        print(f"Error running pagination benchmark: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offset vs cursor pagination of sales.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000], help="Page numbers to time")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the best is reported")
+    args = parser.parse_args()
+    bench_pagination(args.pages, args.page_size, args.repeat)
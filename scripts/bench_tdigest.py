@@ -0,0 +1,63 @@
+import sys
+import os
+import argparse
+import random
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.sketches import TDigest
+
+
+def bench_tdigest(days: int, orders_per_day: int, compression: float, seed: int):
+    random.seed(seed)
+    # Order totals are roughly log-normal: many small baskets, a long tail of whales
+    values = [[random.lognormvariate(4, 1) for _ in range(orders_per_day)] for _ in range(days)]
+    total_values = days * orders_per_day
+
+    # Build: one digest per day, as the order endpoint does
+    start = time.perf_counter()
+    digests = []
+    for day_values in values:
+        digest = TDigest(compression)
+        for value in day_values:
+            digest.add(value)
+        digests.append(digest)
+    build_seconds = time.perf_counter() - start
+
+    # Serialize: what gets stored in sale_daily_sketch
+    start = time.perf_counter()
+    payloads = [digest.to_bytes() for digest in digests]
+    serialize_seconds = time.perf_counter() - start
+
+    # Merge: what a range query does
+    start = time.perf_counter()
+    merged = TDigest(compression)
+    for payload in payloads:
+        merged.merge(TDigest.from_bytes(payload))
+    merge_seconds = time.perf_counter() - start
+
+    print(f"t-digest benchmark: {days} days x {orders_per_day} orders, compression={compression}")
+    print(f"  build:     {total_values / build_seconds:12,.0f} values/s  ({build_seconds:.3f}s)")
+    print(f"  serialize: {days / serialize_seconds:12,.0f} digests/s ({serialize_seconds:.3f}s)")
+    print(f"  merge:     {days / merge_seconds:12,.0f} digests/s ({merge_seconds:.3f}s)")
+    print(f"  stored size: avg {sum(map(len, payloads)) / days:,.0f} bytes/day, {len(merged.means)} centroids merged")
+
+    flat = np.concatenate([np.array(day_values) for day_values in values])
+    print("  accuracy (merged estimate vs exact):")
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = float(np.quantile(flat, q))
+        estimate = merged.quantile(q)
+        print(f"    p{q * 100:g}: {estimate:10.2f} vs {exact:10.2f} ({(estimate - exact) / exact * 100:+.2f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark t-digest build and merge throughput.")
+    parser.add_argument("--days", type=int, default=365, help="Number of daily digests")
+    parser.add_argument("--orders-per-day", type=int, default=2000, help="Orders added to each daily digest")
+    parser.add_argument("--compression", type=float, default=200, help="t-digest compression")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    bench_tdigest(args.days, args.orders_per_day, args.compression, args.seed)
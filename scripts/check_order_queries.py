@@ -0,0 +1,106 @@
+import sys
+import os
+import argparse
+from decimal import Decimal
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app.db.session import SessionLocal, engine
+from app.models import Customer, Order, Product, User, UserRole
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services import product_cache, sketch_store
+from app.api.v1.endpoints.orders import create_order, delete_order
+
+
+class StatementCounter:
+    """Count the statements sent to the database while active."""
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.count += 1
+
+
+def check_order_queries(sizes):
+    """Create orders of increasing size and check they all take the same number of statements.
+
+    Each size is measured with a cold and a warm product cache. The orders are
+    deleted again afterwards, but run it against a scratch database seeded
+    with scripts/demo_data.py. Exits with status 1 if the count grows with the
+    number of lines.
+    """
+    # Keep the periodic sketch flush out of the counts
+    sketch_store.store.flush_seconds = float("inf")
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    db = SessionLocal()
+    created = []
+    counts = {}
+    try:
+        staff = db.query(User).filter(User.role.in_([UserRole.ADMIN, UserRole.STAFF])).first()
+        customer = db.query(Customer).filter(Customer.default_shipping_address_id.isnot(None)).first()
+        products = db.query(Product.id, Product.price).limit(max(sizes)).all()
+        if staff is None or customer is None or not products:
+            print("No staff user, customer with an address or products found, run scripts/demo_data.py first.")
+            return
+
+        for size in sizes:
+            items = []
+            for index in range(size):
+                product = products[index % len(products)]
+                price = Decimal(str(product.price)).quantize(Decimal("0.01"))
+                items.append(OrderItemCreate(product_id=product.id, quantity=1, unit_price=price, total_price=price))
+            subtotal = sum(item.total_price for item in items)
+            order = OrderCreate(
+                customer_id=customer.id,
+                shipping_address_id=customer.default_shipping_address_id,
+                billing_address_id=customer.default_billing_address_id or customer.default_shipping_address_id,
+                subtotal=subtotal,
+                shipping_cost=Decimal("0.00"),
+                tax=Decimal("0.00"),
+                total=subtotal,
+                items=items
+            )
+
+            for cache_state in ("cold", "warm"):
+                if cache_state == "cold":
+                    product_cache.cache.clear()
+                counter.count = 0
+                counter.active = True
+                response = create_order(order, db=db, current_user=staff)
+                counter.active = False
+                created.append(response.id)
+                counts[(size, cache_state)] = counter.count
+    except Exception as e:
+        print(f"Error checking order queries: {e}")
+        db.rollback()
+    finally:
+        counter.active = False
+        for order_id in created:
+            if db.query(Order.id).filter(Order.id == order_id).first():
+                delete_order(order_id, db=db, current_user=None)
+        db.close()
+        event.remove(engine, "before_cursor_execute", counter)
+
+    if not counts:
+        sys.exit(1)
+    print(f"{'lines':>8} {'cold cache':>12} {'warm cache':>12}")
+    for size in sizes:
+        print(f"{size:>8} {counts.get((size, 'cold'), '-'):>12} {counts.get((size, 'warm'), '-'):>12}")
+    for cache_state in ("cold", "warm"):
+        if len({counts.get((size, cache_state)) for size in sizes}) != 1:
+            print(f"FAILED: statements per order grow with the number of lines ({cache_state} cache)")
+            sys.exit(1)
+    print("OK: constant statements per order")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that create_order issues a constant number of statements (writes data).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="Order line counts to measure")
+    args = parser.parse_args()
+    check_order_queries(args.sizes)
@@ -13,8 +13,11 @@ from app.db.base_class import Base
 from app.models import (
     User, Customer, Address, Category, Product, 
     Inventory, Order, OrderItem, Payment, Sale,
-    UserRole, OrderStatus, PaymentStatus, InventoryHistory
+    UserRole, OrderStatus, PaymentStatus, InventoryHistory,
+    SaleDailyRollup, SaleDailySketch
 )
+# order_payments keeps order.amount_paid and payment_status in step as payments are added
+from app.services import order_payments, rollup, sketch_store
 from app.core.security import get_password_hash
 
 # Sample data
@@ -176,6 +179,9 @@ def clear_existing_data():
     db = SessionLocal()
     try:
         # Delete data in reverse order of dependencies
+        rollup.reset_period_rollups(db)
+        db.query(SaleDailyRollup).delete()
+        db.query(SaleDailySketch).delete()
         db.query(Sale).delete()
         db.query(InventoryHistory).delete()
         db.query(Payment).delete()
@@ -295,7 +301,7 @@ def create_demo_data():
         db.commit()
         
         # Create orders and sales records (last 30 days)
-        end_date = datetime.now()
+        end_date = datetime.now().replace(microsecond=0)
         start_date = end_date - timedelta(days=30)
         
         payment_methods = ["CREDIT_CARD", "DEBIT_CARD", "PAYPAL", "BANK_TRANSFER"]
@@ -377,6 +383,7 @@ def create_demo_data():
                                 product_id=product.id,
                                 order_id=order.id,
                                 customer_id=customer.id,
+                                category_id=product.category_id,
                                 quantity=quantity,
                                 unit_price=float(unit_price),
                                 total_amount=float(item_total),
@@ -407,6 +414,11 @@ def create_demo_data():
                 db.add(payment)
         
         db.commit()
+
+        # Populate the analytics rollup and sketches for the generated sales
+        rollup.rebuild(db, start_date.date(), end_date.date())
+        sketch_store.rebuild(db, start_date.date(), end_date.date())
+        db.commit()
         print("Demo data created successfully!")
         
     except Exception as e:
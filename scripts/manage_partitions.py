@@ -0,0 +1,148 @@
+import sys
+import os
+import argparse
+from datetime import date, datetime, time, timedelta
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, func, or_, select
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import Sale, InventoryHistory
+from app.services import partitions
+from app.api.v1.endpoints.sales import filter_sales
+
+
+def show_status():
+    """Print the partitions of every partitioned table."""
+    db = SessionLocal()
+    try:
+        for table in partitions.PARTITIONED_TABLES:
+            listed = partitions.list_partitions(db, table)
+            if not listed:
+                print(f"{table}: not partitioned, run `alembic upgrade head`")
+                continue
+            print(f"{table}: {len(listed)} partitions")
+            for partition in listed:
+                upper = partition["upper"].isoformat() if partition["upper"] else "MAXVALUE"
+                print(f"  {partition['name']:>10} < {upper:<10} ~{partition['rows']} rows")
+    except Exception as e:
+        print(f"Error listing partitions: {e}")
+    finally:
+        db.close()
+
+
+def ensure(months_ahead: int):
+    """Create the monthly partitions up to months_ahead past the current month."""
+    db = SessionLocal()
+    try:
+        for table, created in partitions.ensure_all_partitions(db, months_ahead).items():
+            print(f"{table}: created {', '.join(created) if created else 'nothing'}")
+    except Exception as e:
+        print(f"Error creating partitions: {e}")
+    finally:
+        db.close()
+
+
+def archive(before: date):
+    """Exchange the partitions older than the month of before into archive tables."""
+    db = SessionLocal()
+    try:
+        for table in partitions.PARTITIONED_TABLES:
+            archived = partitions.archive_partitions(db, table, before)
+            print(f"{table}: archived into {', '.join(archived) if archived else 'nothing'}")
+    except Exception as e:
+        print(f"Error archiving partitions: {e}")
+    finally:
+        db.close()
+
+
+def check_pruning(today: date):
+    """EXPLAIN date-bounded queries shaped like the API's and check they only touch the months they cover.
+
+    Exits with status 1 if any query reads a partition outside its range.
+    """
+    month = today.replace(day=1)
+    previous = partitions.add_months(month, -1)
+    last_year = partitions.add_months(month, -12)
+    week = (datetime.combine(today - timedelta(days=7), time.min), datetime.combine(today, time.max))
+    last_month = (datetime.combine(previous, time.min), datetime.combine(month, time.min) - timedelta(microseconds=1))
+    this_month = (datetime.combine(month, time.min), datetime.combine(today, time.max))
+    same_month_last_year = (
+        datetime.combine(last_year, time.min),
+        datetime.combine(partitions.add_months(last_year, 1), time.min) - timedelta(microseconds=1)
+    )
+
+    def between(column, window):
+        return and_(column >= window[0], column <= window[1])
+
+    # (description, table, statement, windows it covers)
+    cases = [
+        ("sale list, last 7 days", "sale",
+         filter_sales(select(Sale), *week).order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(100), [week]),
+        ("sale list by product, previous month", "sale",
+         filter_sales(select(Sale), *last_month, product_id=1), [last_month]),
+        ("daily revenue, previous month", "sale",
+         select(func.date(Sale.sale_date), func.sum(Sale.total_amount)).where(
+             between(Sale.sale_date, last_month)
+         ).group_by(func.date(Sale.sale_date)), [last_month]),
+        ("revenue, this month vs same month last year", "sale",
+         select(func.sum(Sale.total_amount)).where(
+             or_(between(Sale.sale_date, this_month), between(Sale.sale_date, same_month_last_year))
+         ), [this_month, same_month_last_year]),
+        ("inventory history, previous month", "inventory_history",
+         select(InventoryHistory).where(
+             InventoryHistory.inventory_id == 1, between(InventoryHistory.timestamp, last_month)
+         ), [last_month]),
+    ]
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        for description, table, statement, windows in cases:
+            if not partitions.list_partitions(db, table):
+                print(f"FAIL {description}: {table} is not partitioned")
+                failures += 1
+                continue
+            expected = set()
+            for start, end in windows:
+                expected.update(partitions.overlapping_partitions(db, table, start, end))
+            read = partitions.explain_partitions(db, statement)
+            extra = sorted(set(read) - expected)
+            status = "FAIL" if extra else "ok  "
+            failures += bool(extra)
+            print(f"{status} {description}: reads {', '.join(read) or 'no partitions'}")
+            if extra:
+                print(f"     expected only {', '.join(sorted(expected))}")
+    except Exception as e:
+        print(f"Error checking partition pruning: {e}")
+        failures += 1
+    finally:
+        db.close()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of sale and inventory_history.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List partitions")
+    ensure_parser = commands.add_parser("ensure", help="Pre-create future monthly partitions")
+    ensure_parser.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+    archive_parser = commands.add_parser("archive", help="Move old partitions into archive tables")
+    archive_parser.add_argument("--before", type=date.fromisoformat, required=True,
+                                help="Archive every month before this date's month (YYYY-MM-DD)")
+    check_parser = commands.add_parser("check", help="Verify partition pruning with EXPLAIN")
+    check_parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+
+    if args.command == "status":
+        show_status()
+    elif args.command == "ensure":
+        ensure(args.months_ahead)
+    elif args.command == "archive":
+        archive(args.before)
+    else:
+        check_pruning(args.today)
@@ -0,0 +1,60 @@
+import sys
+import os
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from app.db.session import SessionLocal
+from app.models import Sale
+from app.services import rollup
+
+
+def parse_day(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def rebuild_sale_rollup(start_day: date = None, end_day: date = None, batch_days: int = 7):
+    db = SessionLocal()
+    try:
+        if start_day is None or end_day is None:
+            first_sale, last_sale = db.query(
+                func.min(Sale.sale_date), func.max(Sale.sale_date)
+            ).first()
+            if first_sale is None:
+                print("No sales found, nothing to rebuild.")
+                return
+            start_day = start_day or first_sale.date()
+            end_day = end_day or last_sale.date()
+
+        # Rebuild in small day batches so each transaction stays short
+        batch_start = start_day
+        while batch_start <= end_day:
+            batch_end = min(batch_start + timedelta(days=batch_days - 1), end_day)
+            rows = rollup.rebuild(db, batch_start, batch_end)
+            db.commit()
+            print(f"Rebuilt {batch_start} .. {batch_end}: {rows} rollup rows")
+            batch_start = batch_end + timedelta(days=1)
+
+        # The period rollups were folded from the old daily rows; let the scheduler refold them
+        rollup.reset_period_rollups(db)
+        db.commit()
+        print("Period rollups reset, they will be refolded by the background scheduler.")
+
+        print("Sale rollup rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding sale rollup: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sale_daily_rollup table from raw sales.")
+    parser.add_argument("--start", type=parse_day, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_day, help="Last day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-days", type=int, default=7, help="Days rebuilt per transaction")
+    args = parser.parse_args()
+    rebuild_sale_rollup(args.start, args.end, args.batch_days)
@@ -0,0 +1,57 @@
+import sys
+import os
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from app.db.session import SessionLocal
+from app.models import Sale, Order
+from app.services import sketch_store
+
+
+def parse_day(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def rebuild_sale_sketches(start_day: date = None, end_day: date = None, batch_days: int = 7):
+    db = SessionLocal()
+    try:
+        if start_day is None or end_day is None:
+            bounds = [
+                db.query(func.min(Sale.sale_date), func.max(Sale.sale_date)).first(),
+                db.query(func.min(Order.order_date), func.max(Order.order_date)).first(),
+            ]
+            bounds = [(first, last) for first, last in bounds if first is not None]
+            if not bounds:
+                print("No sales or orders found, nothing to rebuild.")
+                return
+            start_day = start_day or min(first for first, _ in bounds).date()
+            end_day = end_day or max(last for _, last in bounds).date()
+
+        # Rebuild in small day batches so each transaction stays short
+        batch_start = start_day
+        while batch_start <= end_day:
+            batch_end = min(batch_start + timedelta(days=batch_days - 1), end_day)
+            rows = sketch_store.rebuild(db, batch_start, batch_end)
+            db.commit()
+            print(f"Rebuilt {batch_start} .. {batch_end}: {rows} sketch rows")
+            batch_start = batch_end + timedelta(days=1)
+
+        print("Sale sketches rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding sale sketches: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the per-day analytics sketches from raw sales and orders.")
+    parser.add_argument("--start", type=parse_day, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_day, help="Last day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-days", type=int, default=7, help="Days rebuilt per transaction")
+    args = parser.parse_args()
+    rebuild_sale_sketches(args.start, args.end, args.batch_days)
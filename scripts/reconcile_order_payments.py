@@ -0,0 +1,75 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from app.db.session import SessionLocal
+from app.models import Order, Payment, PaymentStatus
+from app.services import order_payments
+
+# Differences in amount_paid below this are rounding, not drift
+TOLERANCE = 0.005
+
+
+def reconcile_order_payments(batch_size: int = 1000, fix: bool = False, show: int = 10):
+    """Recompute order.amount_paid and payment_status from payments in id batches and report drift.
+
+    With fix, the drifted orders are rewritten batch by batch.
+    """
+    db = SessionLocal()
+    try:
+        last_id = 0
+        checked = 0
+        drifted = 0
+        while True:
+            orders = db.query(
+                Order.id, Order.total, Order.amount_paid, Order.payment_status
+            ).filter(Order.id > last_id).order_by(Order.id).limit(batch_size).all()
+            if not orders:
+                break
+            last_id = orders[-1].id
+
+            paid = dict(
+                db.query(Payment.order_id, func.sum(Payment.amount)).filter(
+                    Payment.order_id.in_([order.id for order in orders]),
+                    Payment.status == PaymentStatus.COMPLETED
+                ).group_by(Payment.order_id).all()
+            )
+            stale = []
+            for order in orders:
+                expected_paid = float(paid.get(order.id) or 0)
+                expected_status = order_payments.payment_status_for(expected_paid, order.total)
+                if abs(expected_paid - order.amount_paid) > TOLERANCE or expected_status != order.payment_status:
+                    stale.append(order.id)
+                    if drifted + len(stale) <= show:
+                        print(
+                            f"Order {order.id}: stored {order.amount_paid:.2f} {order.payment_status.value}, "
+                            f"expected {expected_paid:.2f} {expected_status.value}"
+                        )
+            checked += len(orders)
+            drifted += len(stale)
+
+            if fix and stale:
+                order_payments.refresh_payment_totals(db, stale)
+                db.commit()
+            else:
+                db.rollback()
+
+        print(f"Checked {checked} orders, {drifted} drifted" + (", fixed." if fix and drifted else "."))
+    except Exception as e:
+        print(f"Error reconciling order payments: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check order.amount_paid and payment_status against payments.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Orders checked per batch")
+    parser.add_argument("--fix", action="store_true", help="Rewrite the drifted orders")
+    parser.add_argument("--show", type=int, default=10, help="Drifted orders printed")
+    args = parser.parse_args()
+    reconcile_order_payments(args.batch_size, args.fix, args.show)
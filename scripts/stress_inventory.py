@@ -0,0 +1,106 @@
+import sys
+import os
+import argparse
+import threading
+from collections import Counter
+from decimal import Decimal
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from app.db.session import SessionLocal
+from app.models import Order, Product, Inventory, Sale
+from app.schemas.sale import SaleCreate
+from app.api.v1.endpoints.sales import create_sale
+
+
+def stress_inventory(workers: int, attempts: int, stock: int):
+    """Hammer create_sale for one product from many threads and check for oversell.
+
+    Sets the product's stock to ``stock`` and lets ``workers`` threads try to
+    sell one unit ``attempts`` times each. Exactly ``stock`` sales must succeed
+    and the stock must end at zero. Writes real sales, so run it against a
+    scratch database seeded with scripts/demo_data.py.
+    """
+    db = SessionLocal()
+    try:
+        order = db.query(Order).first()
+        product = db.query(Product).join(Inventory, Inventory.product_id == Product.id).first()
+        if order is None or product is None:
+            print("No orders or stocked products found, run scripts/demo_data.py first.")
+            return
+        # Stock held by open reservations is not for sale
+        db.query(Inventory).filter(Inventory.product_id == product.id).update(
+            {Inventory.quantity: Inventory.reserved + stock}, synchronize_session=False
+        )
+        db.commit()
+        start_quantity = db.query(Inventory.quantity).filter(Inventory.product_id == product.id).scalar()
+        sales_before = db.query(Sale).filter(Sale.product_id == product.id).count()
+        order_id, customer_id, product_id = order.id, order.customer_id, product.id
+        price = Decimal(str(product.price)).quantize(Decimal("0.01"))
+    finally:
+        db.close()
+
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(attempts):
+            session = SessionLocal()
+            try:
+                create_sale(
+                    SaleCreate(
+                        product_id=product_id,
+                        order_id=order_id,
+                        customer_id=customer_id,
+                        quantity=1,
+                        unit_price=price,
+                        total_amount=price
+                    ),
+                    db=session,
+                    current_user=None
+                )
+                outcome = "sold"
+            except HTTPException as e:
+                session.rollback()
+                outcome = e.detail
+            except Exception as e:
+                session.rollback()
+                outcome = f"error: {type(e).__name__}"
+            finally:
+                session.close()
+            with lock:
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = SessionLocal()
+    try:
+        remaining = db.query(Inventory.quantity).filter(Inventory.product_id == product_id).scalar()
+        sales_created = db.query(Sale).filter(Sale.product_id == product_id).count() - sales_before
+    finally:
+        db.close()
+
+    print(f"Inventory stress test: {workers} workers x {attempts} attempts on a stock of {stock}")
+    for outcome, count in outcomes.most_common():
+        print(f"  {outcome}: {count}")
+    print(f"  remaining stock: {remaining}, sales created: {sales_created}")
+    expected_sold = min(stock, workers * attempts)
+    if remaining < 0 or outcomes["sold"] != expected_sold or sales_created != expected_sold or remaining != start_quantity - expected_sold:
+        print("FAILED: stock and sales do not add up")
+        sys.exit(1)
+    print("OK: no oversell and no lost updates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that concurrent sales never oversell (writes data).")
+    parser.add_argument("--workers", type=int, default=24, help="Parallel threads, each with its own connection")
+    parser.add_argument("--attempts", type=int, default=20, help="Sales attempted per worker")
+    parser.add_argument("--stock", type=int, default=300, help="Stock available at the start")
+    args = parser.parse_args()
+    stress_inventory(args.workers, args.attempts, args.stock)
@@ -0,0 +1,110 @@
+import sys
+import os
+import argparse
+import threading
+from collections import Counter
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import SessionLocal
+from app.models import Inventory, InventoryReservation, Order, Product
+from app.services import reservations
+
+
+def stress_reservations(workers: int, stock: int):
+    """Reserve one unit of a product for many orders at once and check nothing is over-reserved.
+
+    Makes ``stock`` units available, then lets ``workers`` threads each
+    reserve one unit for a different order. Exactly ``stock`` reservations
+    must succeed, after which the reservations are released again and the
+    reserved count must be back where it started. Run it against a scratch
+    database seeded with scripts/demo_data.py.
+    """
+    db = SessionLocal()
+    try:
+        product = db.query(Product).join(Inventory, Inventory.product_id == Product.id).first()
+        if product is None:
+            print("No stocked products found, run scripts/demo_data.py first.")
+            return
+        product_id = product.id
+        # Orders that hold no reservation for the product yet
+        order_ids = [
+            order_id for order_id, in db.query(Order.id).filter(
+                ~Order.id.in_(
+                    db.query(InventoryReservation.order_id).filter(InventoryReservation.product_id == product_id)
+                )
+            ).limit(workers)
+        ]
+        if len(order_ids) < workers:
+            print(f"Only {len(order_ids)} orders available, run scripts/demo_data.py or lower --workers.")
+            return
+        db.query(Inventory).filter(Inventory.product_id == product_id).update(
+            {Inventory.quantity: Inventory.reserved + stock}, synchronize_session=False
+        )
+        db.commit()
+        start_reserved = db.query(Inventory.reserved).filter(Inventory.product_id == product_id).scalar()
+    finally:
+        db.close()
+
+    outcomes = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(workers)
+
+    def worker(order_id: int):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            short = reservations.adjust(session, order_id, {product_id: 1})
+            if short:
+                session.rollback()
+                outcome = "insufficient"
+            else:
+                session.commit()
+                outcome = "reserved"
+        except Exception as e:
+            session.rollback()
+            outcome = f"error: {type(e).__name__}"
+        finally:
+            session.close()
+        with lock:
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker, args=(order_id,)) for order_id in order_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = SessionLocal()
+    try:
+        reserved = db.query(Inventory.reserved).filter(Inventory.product_id == product_id).scalar()
+        available = reservations.available(db, [product_id]).get(product_id)
+        released = reservations.release_orders(db, order_ids)
+        db.commit()
+        reserved_after = db.query(Inventory.reserved).filter(Inventory.product_id == product_id).scalar()
+    except Exception as e:
+        print(f"Error checking reservations: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"Reservation stress test: {workers} orders reserving 1 unit of a stock of {stock}")
+    for outcome, count in outcomes.most_common():
+        print(f"  {outcome}: {count}")
+    print(f"  reserved: {reserved - start_reserved}, available: {available}, released: {released}")
+    expected = min(stock, workers)
+    if (outcomes["reserved"] != expected or reserved - start_reserved != expected
+            or available != stock - expected or released != expected or reserved_after != start_reserved):
+        print("FAILED: reservations and stock do not add up")
+        sys.exit(1)
+    print("OK: no over-reservation and reservations released cleanly")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that concurrent reservations never exceed the stock (writes data).")
+    parser.add_argument("--workers", type=int, default=50, help="Parallel threads, each reserving for its own order")
+    parser.add_argument("--stock", type=int, default=20, help="Stock available at the start")
+    args = parser.parse_args()
+    stress_reservations(args.workers, args.stock)